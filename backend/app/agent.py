@@ -1,5 +1,7 @@
 from typing import List, Dict, Any, Optional
 import uuid
+import asyncio
+import json
 from datetime import datetime
 import os
 import logging
@@ -17,7 +19,12 @@ class KnowledgeAgent:
             import google.generativeai as genai
             api_key = os.getenv("GEMINI_API_KEY")
             if api_key:
-                genai.configure(api_key=api_key)
+                api_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+                if api_endpoint:
+                    # Alternate endpoint, e.g. a proxy or the load-test stub server
+                    genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": api_endpoint})
+                else:
+                    genai.configure(api_key=api_key)
                 self.model = genai.GenerativeModel('gemini-2.0-flash')
                 self.gemini_available = True
                 logger.info("Gemini AI initialized successfully")
@@ -28,14 +35,79 @@ class KnowledgeAgent:
         except Exception as e:
             logger.warning(f"Failed to initialize Gemini: {e}. Using fallback responses.")
     
-    def query(self, question: str, user_id: str, context: Optional[Dict] = None) -> Dict[str, Any]:
+    def query(self, question: str, user_id: str, context: Optional[Dict] = None,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Search for relevant documents, restricted to the requested scope if any
+        relevant_docs = self.vector_store.search(question, user_id, n_results=5, where=where)
+        return self._answer(question, relevant_docs, context)
+    
+    async def query_many(self, questions: List[str], user_id: str, contexts: Optional[List[Optional[Dict]]] = None,
+                         wheres: Optional[List[Optional[Dict[str, Any]]]] = None,
+                         max_concurrency: int = 8, errors: Optional[List[Optional[str]]] = None) -> List[Dict[str, Any]]:
+        """Answer several questions with a single retrieval pass.
+        
+        All questions sharing a scope are embedded and searched in one vector store
+        call; answer generation then runs concurrently, at most ``max_concurrency``
+        at a time. Results keep the order of ``questions``; a failed item carries an
+        "error" message instead of raising. Items already failed by the caller
+        (``errors``, e.g. from resolving filters) are skipped and reported as such.
+        """
+        contexts = contexts or [None] * len(questions)
+        wheres = wheres or [None] * len(questions)
+        errors = list(errors or [None] * len(questions))
+        
+        # One search_many call per distinct where clause (usually just one)
+        groups: Dict[str, List[int]] = {}
+        for i, where in enumerate(wheres):
+            if errors[i] is None:
+                groups.setdefault(json.dumps(where, sort_keys=True), []).append(i)
+        
+        all_docs: List[List[Dict]] = [[] for _ in questions]
+        for indices in groups.values():
+            try:
+                group_docs = await asyncio.to_thread(
+                    self.vector_store.search_many, [questions[i] for i in indices], user_id, 5, wheres[indices[0]]
+                )
+            except Exception as e:
+                # A bad scope only fails the questions that share it
+                logger.error(f"Error searching for batched questions: {e}")
+                for i in indices:
+                    errors[i] = str(e)
+                continue
+            for i, relevant_docs in zip(indices, group_docs):
+                all_docs[i] = relevant_docs
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        def error_result(context: Optional[Dict], error: str) -> Dict[str, Any]:
+            return {
+                "answer": "",
+                "sources": [],
+                "conversation_id": self._get_conversation_id(context),
+                "error": error
+            }
+        
+        async def answer_one(question: str, relevant_docs: List[Dict], context: Optional[Dict],
+                             error: Optional[str]) -> Dict[str, Any]:
+            if error is not None:
+                return error_result(context, error)
+            async with semaphore:
+                try:
+                    return await asyncio.to_thread(self._answer, question, relevant_docs, context)
+                except Exception as e:
+                    logger.error(f"Error answering batched question: {e}")
+                    return error_result(context, str(e))
+        
+        return await asyncio.gather(*[
+            answer_one(question, relevant_docs, context, error)
+            for question, relevant_docs, context, error in zip(questions, all_docs, contexts, errors)
+        ])
+    
+    def _answer(self, question: str, relevant_docs: List[Dict], context: Optional[Dict] = None) -> Dict[str, Any]:
         # Get conversation history
         conversation_id = self._get_conversation_id(context)
         history = self._get_conversation_history(conversation_id)
         
-        # Search for relevant documents
-        relevant_docs = self.vector_store.search(question, user_id, n_results=5)
-        
         if not relevant_docs:
             return {
                 "answer": "I couldn't find any relevant information in your documents to answer this question. Please upload relevant documents first.",
@@ -4,10 +4,15 @@ from passlib.context import CryptContext
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
 import uuid
 import json
+import os
 
-from .database import get_db, User
+from .database import get_db, SessionLocal, User
 
 # Security configuration
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -16,12 +21,45 @@ SECRET_KEY = "your-secret-key-change-this-in-production"  # Make sure this is co
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# bcrypt is deliberately slow (~100-300 ms), so it runs off the event loop on a
+# small dedicated pool; the pool size caps how many hashes run at once
+BCRYPT_MAX_CONCURRENCY = int(os.getenv("BCRYPT_MAX_CONCURRENCY", "2"))
+_hash_executor = ThreadPoolExecutor(max_workers=BCRYPT_MAX_CONCURRENCY, thread_name_prefix="bcrypt")
+
+# Validated tokens map straight to their user for a short while. Nothing in the
+# app updates or deletes users, so expiry is the only invalidation; a user
+# changed directly in the database is picked up within the TTL
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+_token_cache = {}  # token -> (user, cached_until)
+_token_cache_lock = threading.Lock()
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
+def _cache_user(token: str, user, token_expires_at: float):
+    cached_until = min(time.time() + TOKEN_CACHE_TTL_SECONDS, token_expires_at)
+    with _token_cache_lock:
+        if len(_token_cache) >= TOKEN_CACHE_MAX_SIZE:
+            now = time.time()
+            for key in [key for key, (_, until) in _token_cache.items() if until <= now]:
+                del _token_cache[key]
+            if len(_token_cache) >= TOKEN_CACHE_MAX_SIZE:
+                # Still full: drop the oldest entry (dicts keep insertion order)
+                del _token_cache[next(iter(_token_cache))]
+        _token_cache[token] = (user, cached_until)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -29,7 +67,7 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def create_user(user_data):
+async def create_user(user_data):
     db = next(get_db())
     
     try:
@@ -41,7 +79,7 @@ def create_user(user_data):
             raise HTTPException(status_code=400, detail="Email already registered")
         
         user_id = str(uuid.uuid4())
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         
         user = User(
             id=user_id,
@@ -64,12 +102,12 @@ def create_user(user_data):
             raise e
         raise HTTPException(status_code=500, detail="User registration failed")
 
-def authenticate_user(login_data):
+async def authenticate_user(login_data):
     db = next(get_db())
     try:
         user = db.query(User).filter(User.username == login_data.username).first()
         
-        if not user or not verify_password(login_data.password, user.hashed_password):
+        if not user or not await verify_password_async(login_data.password, user.hashed_password):
             raise HTTPException(status_code=400, detail="Incorrect username or password")
         
         access_token = create_access_token(data={"sub": user.username})
@@ -80,18 +118,35 @@ def authenticate_user(login_data):
             raise e
         raise HTTPException(status_code=500, detail="Authentication failed")
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def _load_user(username: str):
+    db = SessionLocal()
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        user = db.query(User).filter(User.username == username).first()
+        if user is not None:
+            # Detach so the cached instance outlives this session
+            db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # Hot path: a token validated recently is a single dictionary lookup
+    token = credentials.credentials
+    cached = _token_cache.get(token)
+    if cached and cached[1] > time.time():
+        return cached[0]
+    
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     
-    db = next(get_db())
-    user = db.query(User).filter(User.username == username).first()
+    user = await asyncio.to_thread(_load_user, username)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     
+    _cache_user(token, user, payload["exp"])
     return user
\ No newline at end of file
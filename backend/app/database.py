@@ -1,8 +1,10 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Boolean, Text
+from sqlalchemy import create_engine, Column, String, DateTime, Boolean, Text, Integer, Index
+from sqlalchemy.exc import OperationalError, IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 import os
+import logging
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./knowledge_copilot.db")
 
@@ -10,17 +12,55 @@ engine = create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+class User(Base):
+    __tablename__ = "users"
+    
+    id = Column(String, primary_key=True, index=True)
+    username = Column(String, unique=True, index=True)
+    email = Column(String, unique=True, index=True)
+    hashed_password = Column(String)
+    profile_data = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Document(Base):
     __tablename__ = "documents"
     
     id = Column(String, primary_key=True, index=True)
     user_id = Column(String, default="default")  # Simple user_id since no auth
-    filename = Column(String)
+    filename = Column(String, index=True)
     file_type = Column(String)
-    upload_date = Column(DateTime, default=datetime.utcnow)
+    upload_date = Column(DateTime, default=datetime.utcnow, index=True)
     processed = Column(Boolean, default=False)
     doc_metadata = Column(Text, nullable=True)
 
+class IngestCheckpoint(Base):
+    __tablename__ = "ingest_checkpoints"
+    
+    document_id = Column(String, primary_key=True, index=True)
+    content_hash = Column(String, index=True)
+    filename = Column(String)
+    total_chunks = Column(Integer, default=0)
+    committed_chunks = Column(Integer, default=0)  # Chunks durably written to the vector store
+    status = Column(String, default="in_progress")  # in_progress | completed
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Doubles as the ingest lease
+    
+    __table_args__ = (
+        # At most one running ingest per content, so concurrent uploads can't share chunk ids
+        Index(
+            "uq_ingest_checkpoints_in_progress_content",
+            "content_hash",
+            unique=True,
+            sqlite_where=(status == "in_progress"),
+            postgresql_where=(status == "in_progress")
+        ),
+    )
+
+class OrphanSuspect(Base):
+    __tablename__ = "orphan_suspects"
+    
+    document_id = Column(String, primary_key=True)
+    first_seen = Column(DateTime, default=datetime.utcnow)  # First pass that found chunks without a document
+
 def get_db():
     db = SessionLocal()
     try:
@@ -29,4 +69,12 @@ def get_db():
         db.close()
 
 # Create tables
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+Base.metadata.create_all(bind=engine)
+
+# create_all skips indexes on tables that already exist, so add any new ones
+for index in list(Document.__table__.indexes) + list(IngestCheckpoint.__table__.indexes):
+    try:
+        index.create(bind=engine, checkfirst=True)
+    except (OperationalError, IntegrityError) as e:
+        # e.g. duplicate in-progress checkpoints left by an older version
+        logging.getLogger(__name__).warning(f"Could not create index {index.name}: {e}")
\ No newline at end of file
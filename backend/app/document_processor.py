@@ -4,12 +4,16 @@ import email
 from email import policy
 from bs4 import BeautifulSoup
 import os
-from typing import List, Dict
+import tempfile
+from typing import List, Dict, Tuple
 import chardet
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Attachment types that are routed back through the regular format handlers
+ATTACHMENT_EXTENSIONS = ['.pdf', '.docx', '.doc', '.txt', '.md', '.html', '.htm']
+
 class DocumentProcessor:
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
         self.chunk_size = chunk_size
@@ -17,25 +21,29 @@ class DocumentProcessor:
     
     async def process_document(self, file_path: str, filename: str) -> List[Dict]:
         """Process different document types and return chunks"""
-        file_extension = os.path.splitext(filename)[1].lower()
-        
         try:
-            if file_extension == '.pdf':
-                return self._process_pdf(file_path)
-            elif file_extension in ['.docx', '.doc']:
-                return self._process_docx(file_path)
-            elif file_extension in ['.txt', '.md']:
-                return self._process_text(file_path)
-            elif file_extension == '.eml':
-                return self._process_email(file_path)
-            elif file_extension in ['.html', '.htm']:
-                return self._process_html(file_path)
-            else:
-                raise ValueError(f"Unsupported file type: {file_extension}")
+            return self.process_file(file_path, filename)
         except Exception as e:
             logger.error(f"Error processing document {filename}: {e}")
             raise
     
+    def process_file(self, file_path: str, filename: str) -> List[Dict]:
+        """Dispatch a file to the handler for its extension (synchronous)"""
+        file_extension = os.path.splitext(filename)[1].lower()
+        
+        if file_extension == '.pdf':
+            return self._process_pdf(file_path)
+        elif file_extension in ['.docx', '.doc']:
+            return self._process_docx(file_path)
+        elif file_extension in ['.txt', '.md']:
+            return self._process_text(file_path)
+        elif file_extension == '.eml':
+            return self._process_email(file_path)
+        elif file_extension in ['.html', '.htm']:
+            return self._process_html(file_path)
+        else:
+            raise ValueError(f"Unsupported file type: {file_extension}")
+    
     def _process_pdf(self, file_path: str) -> List[Dict]:
         """Extract text from PDF and chunk it"""
         chunks = []
@@ -109,31 +117,10 @@ class DocumentProcessor:
     def _process_email(self, file_path: str) -> List[Dict]:
         """Extract content from email files"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-                msg = email.message_from_file(file, policy=policy.default)
-            
-            email_content = {
-                'subject': msg['subject'] or '',
-                'from': msg['from'] or '',
-                'to': msg['to'] or '',
-                'date': msg['date'] or '',
-                'body': ''
-            }
-            
-            # Extract body
-            if msg.is_multipart():
-                for part in msg.walk():
-                    content_type = part.get_content_type()
-                    if content_type == 'text/plain':
-                        email_content['body'] = part.get_content()
-                        break
-            else:
-                email_content['body'] = msg.get_content()
-            
-            # Format email as text
-            email_text = f"Subject: {email_content['subject']}\nFrom: {email_content['from']}\nTo: {email_content['to']}\nDate: {email_content['date']}\n\n{email_content['body']}"
-            
-            chunks = self._chunk_text(email_text, chunk_type="email")
+            with open(file_path, 'rb') as file:
+                msg = email.message_from_binary_file(file, policy=policy.default)
+            
+            chunks = self.process_email_message(msg)
             logger.info(f"Processed email with {len(chunks)} chunks")
             return chunks
             
@@ -141,6 +128,69 @@ class DocumentProcessor:
             logger.error(f"Error processing email {file_path}: {e}")
             raise
     
+    def process_email_message(self, msg) -> List[Dict]:
+        """Chunk a parsed email message, including supported attachments"""
+        body, attachments = self._extract_email_parts(msg)
+        
+        # Format email as text
+        email_text = f"Subject: {msg['subject'] or ''}\nFrom: {msg['from'] or ''}\nTo: {msg['to'] or ''}\nDate: {msg['date'] or ''}\n\n{body}"
+        chunks = self._chunk_text(email_text, chunk_type="email")
+        
+        for attachment_name, payload in attachments:
+            try:
+                attachment_chunks = self._process_attachment(attachment_name, payload)
+            except Exception as e:
+                logger.warning(f"Error processing attachment {attachment_name}: {e}")
+                continue
+            for chunk in attachment_chunks:
+                chunk["attachment"] = attachment_name
+            chunks.extend(attachment_chunks)
+        
+        return chunks
+    
+    def _extract_email_parts(self, msg) -> Tuple[str, List[Tuple[str, bytes]]]:
+        """Return the message body and its (filename, payload) attachments"""
+        plain_parts = []
+        html_parts = []
+        attachments = []
+        
+        for part in msg.walk():
+            if part.is_multipart():
+                continue
+            
+            attachment_name = part.get_filename()
+            if attachment_name or part.get_content_disposition() == 'attachment':
+                extension = os.path.splitext(attachment_name or '')[1].lower()
+                if extension in ATTACHMENT_EXTENSIONS:
+                    payload = part.get_payload(decode=True)
+                    if payload:
+                        attachments.append((attachment_name, payload))
+                continue
+            
+            content_type = part.get_content_type()
+            try:
+                if content_type == 'text/plain':
+                    plain_parts.append(part.get_content())
+                elif content_type == 'text/html':
+                    html_parts.append(BeautifulSoup(part.get_content(), 'html.parser').get_text())
+            except (LookupError, UnicodeDecodeError) as e:
+                logger.warning(f"Skipping undecodable email part ({content_type}): {e}")
+        
+        # Prefer the plain-text alternative, fall back to the rendered HTML body
+        body = '\n'.join(plain_parts) if plain_parts else '\n'.join(html_parts)
+        return body, attachments
+    
+    def _process_attachment(self, attachment_name: str, payload: bytes) -> List[Dict]:
+        """Run an attachment through the handler for its file type"""
+        extension = os.path.splitext(attachment_name)[1].lower()
+        fd, temp_path = tempfile.mkstemp(suffix=extension)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(payload)
+            return self.process_file(temp_path, attachment_name)
+        finally:
+            os.remove(temp_path)
+    
     def _process_html(self, file_path: str) -> List[Dict]:
         """Extract text from HTML files"""
         try:
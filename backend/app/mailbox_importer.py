@@ -0,0 +1,205 @@
+import mailbox
+import email
+from email import policy
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import threading
+import argparse
+import json
+import os
+import uuid
+from typing import Iterator, Tuple, Dict, Any, Optional
+import logging
+
+from sqlalchemy.exc import IntegrityError
+
+from .database import SessionLocal, Document
+
+logger = logging.getLogger(__name__)
+
+def message_document_id(mailbox_name: str, message_key: str) -> str:
+    """Stable document id for a message, so re-imports map onto the same rows and chunks"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"mailbox:{mailbox_name}/{message_key}"))
+
+class MailboxImporter:
+    """Stream messages out of an mbox file or Maildir directory into the knowledge base.
+
+    Messages are read one at a time from the mailbox, so memory use stays flat
+    regardless of mailbox size. Parsing, chunking and indexing run on a thread
+    pool, with at most ``max_pending`` messages in flight at once.
+
+    Document ids are derived from the mailbox name and Message-ID, so
+    re-running an interrupted import skips messages that already have a
+    ``Document`` row and re-indexes the rest in place.
+    """
+
+    def __init__(self, document_processor, vector_store, max_workers: int = 4, max_pending: Optional[int] = None):
+        self.document_processor = document_processor
+        self.vector_store = vector_store
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max_workers * 4
+
+    def open_mailbox(self, path: str) -> mailbox.Mailbox:
+        """Open a Maildir directory or an mbox file without parsing its messages"""
+        if os.path.isdir(path):
+            return mailbox.Maildir(path, factory=None, create=False)
+        if os.path.isfile(path):
+            return mailbox.mbox(path, factory=None, create=False)
+        raise ValueError(f"Mailbox not found: {path}")
+
+    def iter_raw_messages(self, path: str) -> Iterator[Tuple[str, bytes]]:
+        """Yield (key, raw bytes) for each message, reading one message at a time"""
+        box = self.open_mailbox(path)
+        try:
+            for key in box.iterkeys():
+                try:
+                    yield str(key), box.get_bytes(key)
+                except Exception as e:
+                    logger.warning(f"Error reading message {key} from {path}: {e}")
+        finally:
+            box.close()
+
+    def import_mailbox(self, path: str, user_id: str = "default") -> Dict[str, int]:
+        """Import every message of a mailbox and return import statistics"""
+        stats = {"messages": 0, "imported": 0, "already_imported": 0, "skipped": 0, "failed": 0, "chunks": 0}
+        stats_lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.max_pending)
+        mailbox_name = os.path.basename(os.path.normpath(path))
+
+        def on_done(future):
+            slots.release()
+            with stats_lock:
+                try:
+                    chunk_count = future.result()
+                except Exception:
+                    stats["failed"] += 1
+                    return
+                if chunk_count is None:
+                    stats["already_imported"] += 1
+                elif chunk_count:
+                    stats["imported"] += 1
+                    stats["chunks"] += chunk_count
+                else:
+                    stats["skipped"] += 1
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for key, raw_message in self.iter_raw_messages(path):
+                # Backpressure: block the reader while too many messages are in flight
+                slots.acquire()
+                with stats_lock:
+                    stats["messages"] += 1
+                future = executor.submit(self._import_message, raw_message, key, mailbox_name, user_id)
+                future.add_done_callback(on_done)
+
+        logger.info(f"Imported mailbox {path}: {stats}")
+        return stats
+
+    def _import_message(self, raw_message: bytes, key: str, mailbox_name: str, user_id: str) -> Optional[int]:
+        """Parse, chunk and index a single message.
+
+        Returns the number of chunks stored, or None if an earlier run already
+        imported the message.
+        """
+        try:
+            msg = email.message_from_bytes(raw_message, policy=policy.default)
+            message_metadata = self._message_metadata(msg, key, mailbox_name)
+            document_id = message_document_id(mailbox_name, message_metadata["message_id"] or key)
+            if self._is_imported(document_id):
+                return None
+
+            chunks = self.document_processor.process_email_message(msg)
+            if not chunks:
+                return 0
+
+            filename = f"{message_metadata['subject'] or '(no subject)'}.eml"
+
+            self.vector_store.add_documents(
+                chunks, document_id, user_id, filename,
+                extra_metadata={
+                    "sender": message_metadata["sender"],
+                    "sent_date": message_metadata["date"],
+                    "thread_id": message_metadata["thread_id"],
+                    "mailbox": mailbox_name,
+                }
+            )
+
+            db = SessionLocal()
+            try:
+                db.add(Document(
+                    id=document_id,
+                    user_id=user_id,
+                    filename=filename,
+                    file_type="message/rfc822",
+                    upload_date=datetime.utcnow(),
+                    processed=True,
+                    doc_metadata=json.dumps(message_metadata)
+                ))
+                db.commit()
+            except IntegrityError:
+                # A duplicate of this message was imported concurrently
+                db.rollback()
+                return None
+            finally:
+                db.close()
+
+            return len(chunks)
+        except Exception as e:
+            logger.error(f"Error importing message {key} from {mailbox_name}: {e}")
+            raise
+
+    def _is_imported(self, document_id: str) -> bool:
+        db = SessionLocal()
+        try:
+            return db.query(Document.id).filter(Document.id == document_id).first() is not None
+        finally:
+            db.close()
+
+    def _message_metadata(self, msg, key: str, mailbox_name: str) -> Dict[str, Any]:
+        """Collect sender, date and thread information for a message"""
+        message_id = str(msg['message-id'] or '').strip()
+        references = str(msg['references'] or '').split()
+        in_reply_to = str(msg['in-reply-to'] or '').strip()
+
+        # A thread is identified by the first message it started from
+        thread_id = references[0] if references else (in_reply_to or message_id or key)
+
+        date = ''
+        if msg['date']:
+            try:
+                date = parsedate_to_datetime(str(msg['date'])).isoformat()
+            except (TypeError, ValueError):
+                date = str(msg['date'])
+
+        return {
+            "mailbox": mailbox_name,
+            "mailbox_key": key,
+            "message_id": message_id,
+            "subject": str(msg['subject'] or ''),
+            "sender": str(msg['from'] or ''),
+            "to": str(msg['to'] or ''),
+            "date": date,
+            "thread_id": thread_id,
+            "in_reply_to": in_reply_to,
+        }
+
+def main():
+    from dotenv import load_dotenv
+    from .document_processor import DocumentProcessor
+    from .vector_store import create_vector_store
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Import an mbox file or Maildir directory")
+    parser.add_argument("path", help="Path to an mbox file or Maildir directory")
+    parser.add_argument("--user-id", default="default")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    importer = MailboxImporter(DocumentProcessor(), create_vector_store(), max_workers=args.workers)
+    stats = importer.import_mailbox(args.path, user_id=args.user_id)
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,587 @@
+import numpy as np
+import sqlite3
+import threading
+import fcntl
+from contextlib import contextmanager
+import json
+import os
+from typing import List, Dict, Any, Optional, Callable, Iterator
+import logging
+
+from .search_filters import is_empty_scope
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DTYPES = ("float16", "int8")
+
+# Same setting as the Chroma backend
+DEFAULT_BATCH_SIZE = int(os.getenv("CHROMA_BATCH_SIZE", "256"))
+
+_SQL_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+def _where_to_sql(where: Dict[str, Any]):
+    """Translate a Chroma-style where clause into SQL over the chunks side table"""
+    if "$and" in where or "$or" in where:
+        joiner = " AND " if "$and" in where else " OR "
+        parts = [_where_to_sql(condition) for condition in where.get("$and", where.get("$or"))]
+        return "(" + joiner.join(sql for sql, _ in parts) + ")", [param for _, params in parts for param in params]
+
+    clauses, params = [], []
+    for key, condition in where.items():
+        # document_id has its own indexed column; everything else lives in the JSON blob
+        column = "document_id" if key == "document_id" else f"json_extract(metadata, '$.{key}')"
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            if operator in ("$in", "$nin"):
+                if not value:
+                    clauses.append("0" if operator == "$in" else "1")
+                    continue
+                negate = "NOT " if operator == "$nin" else ""
+                clauses.append(f"{column} {negate}IN ({','.join('?' * len(value))})")
+                params.extend(value)
+            elif operator in _SQL_OPERATORS:
+                clauses.append(f"{column} {_SQL_OPERATORS[operator]} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unsupported where operator: {operator}")
+    return "(" + " AND ".join(clauses) + ")", params
+
+class MmapVectorStore:
+    """Exact-search vector store over a memory-mapped embedding matrix.
+
+    Embeddings are L2-normalised and stored row by row in a flat float16 or
+    int8-quantised file that is opened with ``np.memmap``, so startup is just an
+    mmap and the page cache is shared by every worker process. Chunk text and
+    metadata live in a SQLite side table keyed by matrix row. Deleted rows are
+    tombstoned; ``compact_if_needed()``, run periodically by the reconciler,
+    reclaims them once they pass a threshold.
+
+    Exposes the same ``add_documents``/``search``/``delete_document`` API as
+    ``VectorStore``. Writers in any process serialise on an exclusive ``flock``
+    held from reloading the latest state to the side-table commit. Searches
+    hold it shared, so they pick up other processes' changes and never see a
+    compaction half done.
+    """
+
+    def __init__(self, persist_directory: Optional[str] = None, dtype: str = "float16",
+                 embedding_function=None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 block_size: int = 65536, compaction_threshold: float = 0.25):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype: {dtype}")
+
+        self.persist_directory = persist_directory or os.getenv("MMAP_INDEX_DIRECTORY", "./mmap_index")
+        os.makedirs(self.persist_directory, exist_ok=True)
+
+        if embedding_function is None:
+            # Same model Chroma uses by default, so both backends rank alike
+            from chromadb.utils import embedding_functions
+            embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self.embedding_function = embedding_function
+        self.batch_size = batch_size
+        self.block_size = block_size
+        self.compaction_threshold = compaction_threshold
+
+        # The RLock serialises threads of this process, the flock serialises processes
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_file = open(os.path.join(self.persist_directory, "write.lock"), "a+")
+        self._conn = sqlite3.connect(os.path.join(self.persist_directory, "chunks.db"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row_id INTEGER PRIMARY KEY,
+                chunk_id TEXT UNIQUE NOT NULL,
+                document_id TEXT NOT NULL,
+                user_id TEXT,
+                content TEXT,
+                metadata TEXT,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks(document_id);
+            CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._conn.execute("INSERT OR IGNORE INTO settings VALUES ('dtype', ?)", (dtype,))
+        self._conn.execute("INSERT OR IGNORE INTO settings VALUES ('generation', '0')")
+        self._conn.commit()
+
+        self._matrix = None
+        self._scales = None
+        with self._cross_process_lock(fcntl.LOCK_SH):
+            self._load()
+        logger.info(f"Memory-mapped vector store initialized with {self._live_count} live chunks")
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def add_documents(self, chunks: List[Dict], document_id: str, user_id: str, filename: str,
+                      extra_metadata: Optional[Dict[str, Any]] = None, start_index: int = 0,
+                      on_batch_committed: Optional[Callable[[int], None]] = None):
+        """Add document chunks in batches, see ``VectorStore.add_documents``"""
+        if not chunks:
+            logger.warning("No chunks to add to vector store")
+            return
+
+        for batch_start in range(start_index, len(chunks), self.batch_size):
+            batch_end = min(batch_start + self.batch_size, len(chunks))
+            rows = []
+
+            for i in range(batch_start, batch_end):
+                chunk = chunks[i]
+                metadata = {
+                    "document_id": document_id,
+                    "user_id": user_id,
+                    "filename": filename,
+                    "chunk_index": i,
+                    "chunk_type": chunk.get("type", "text"),
+                    "page_number": chunk.get("page_number", 0)
+                }
+                if chunk.get("attachment"):
+                    metadata["attachment"] = chunk["attachment"]
+                if extra_metadata:
+                    metadata.update({k: v for k, v in extra_metadata.items() if v is not None})
+                rows.append((f"{document_id}_{i}", chunk["content"], metadata))
+
+            try:
+                embeddings = self._embed([content for _, content, _ in rows])
+                with self._exclusive():
+                    self._write_rows(rows, embeddings)
+            except Exception as e:
+                logger.error(f"Error adding documents to vector store (chunks {batch_start}-{batch_end}): {e}")
+                raise
+
+            if on_batch_committed:
+                on_batch_committed(batch_end)
+
+        logger.info(f"Successfully added {len(chunks) - start_index} chunks to vector store")
+
+    def search(self, query: str, user_id: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """Exact top-k search over all live rows, or only those matching ``where``"""
+        try:
+            return self.search_many([query], user_id, n_results=n_results, where=where)[0]
+        except Exception as e:
+            logger.error(f"Error searching vector store: {e}")
+            return []
+
+    def search_many(self, queries: List[str], user_id: str, n_results: int = 5,
+                    where: Optional[Dict[str, Any]] = None) -> List[List[Dict]]:
+        """Search for several queries with one embedding pass and one matrix scan"""
+        if not queries:
+            return []
+        if is_empty_scope(where):
+            return [[] for _ in queries]
+
+        query_embeddings = self._embed(queries)
+        # Row ids change with every compaction, so hold writers off until the rows are fetched
+        with self._shared():
+            candidate_rows = None
+            if where:
+                # Resolve the filter in SQL first and only score the matching rows
+                sql, params = _where_to_sql(where)
+                candidate_rows = np.fromiter(
+                    (row[0] for row in self._conn.execute(
+                        f"SELECT row_id FROM chunks WHERE deleted = 0 AND {sql} ORDER BY row_id", params
+                    )),
+                    dtype=np.int64
+                )
+            top = self._top_k(query_embeddings, n_results, candidate_rows)
+            return [self._fetch_results(row_ids, scores) for row_ids, scores in top]
+
+    def delete_document(self, document_id: str, user_id: str):
+        """Tombstone all chunks of a document"""
+        try:
+            if self._tombstone([document_id]):
+                logger.info(f"Deleted document {document_id} from vector store")
+        except Exception as e:
+            logger.error(f"Error deleting document from vector store: {e}")
+
+    def delete_documents(self, document_ids: List[str]):
+        """Tombstone all chunks of several documents; errors are raised"""
+        if document_ids and self._tombstone(list(document_ids)):
+            logger.info(f"Deleted {len(document_ids)} documents from vector store")
+
+    def iter_chunks(self, page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Stream live chunks with their embeddings, in pages shaped like Chroma's ``get``.
+
+        Pages by chunk id, which survives compaction, unlike row ids. Embeddings
+        come back dequantised but at the stored precision.
+        """
+        last_chunk_id = ""
+        while True:
+            with self._shared():
+                page = self._conn.execute(
+                    "SELECT row_id, chunk_id, content, metadata FROM chunks "
+                    "WHERE deleted = 0 AND chunk_id > ? ORDER BY chunk_id LIMIT ?",
+                    (last_chunk_id, page_size)
+                ).fetchall()
+                if not page:
+                    return
+                row_ids = [row[0] for row in page]
+                embeddings = self._matrix[row_ids].astype(np.float32)
+                if self._scales is not None:
+                    embeddings *= self._scales[row_ids][:, None]
+            yield {
+                "ids": [row[1] for row in page],
+                "embeddings": embeddings,
+                "documents": [row[2] for row in page],
+                "metadatas": [json.loads(row[3]) for row in page],
+            }
+            last_chunk_id = page[-1][1]
+
+    def upsert_chunks(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Store chunks with precomputed embeddings, e.g. from a snapshot; existing ids are overwritten"""
+        with self._exclusive():
+            self._write_rows(list(zip(ids, documents, metadatas)), self._normalize(embeddings))
+
+    def has_document(self, document_id: str) -> bool:
+        """True if at least one chunk of the document is live"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM chunks WHERE document_id = ? AND deleted = 0 LIMIT 1", (document_id,)
+            ).fetchone() is not None
+
+    def iter_document_ids(self, page_size: int = 1000) -> Iterator[str]:
+        """Stream the document id of every live chunk, one page at a time"""
+        last_row = -1
+        while True:
+            with self._lock:
+                page = self._conn.execute(
+                    "SELECT row_id, document_id FROM chunks WHERE deleted = 0 AND row_id > ? ORDER BY row_id LIMIT ?",
+                    (last_row, page_size)
+                ).fetchall()
+            if not page:
+                return
+            for _, document_id in page:
+                yield document_id
+            last_row = page[-1][0]
+
+    def _tombstone(self, document_ids: List[str]) -> int:
+        """Mark the chunks of the given documents deleted; returns the number of rows"""
+        with self._exclusive():
+            placeholders = ",".join("?" * len(document_ids))
+            row_ids = [row[0] for row in self._conn.execute(
+                f"SELECT row_id FROM chunks WHERE document_id IN ({placeholders}) AND deleted = 0", document_ids
+            )]
+            if not row_ids:
+                return 0
+
+            self._conn.execute(f"UPDATE chunks SET deleted = 1 WHERE document_id IN ({placeholders})", document_ids)
+            self._conn.commit()
+            self._data_version = self._current_data_version()
+            self._live[row_ids] = False
+            self._live_count -= len(row_ids)
+            return len(row_ids)
+
+    def compact_if_needed(self) -> bool:
+        """Compact if tombstones exceed the threshold; returns True if it did.
+
+        Rewrites the whole index, so it belongs in a background task rather than
+        the request path.
+        """
+        with self._exclusive():
+            if not self._row_count or 1 - self._live_count / self._row_count <= self.compaction_threshold:
+                return False
+            self.compact()
+            return True
+
+    def compact(self):
+        """Rewrite the matrix without tombstoned rows and renumber the side table"""
+        with self._exclusive():
+            live_rows = np.flatnonzero(self._live)
+            generation = self._generation + 1
+            dim = self._dim or 0
+
+            new_matrix = self._open_matrix(generation, max(len(live_rows), 1), dim, mode="w+") if dim else None
+            new_scales = self._open_scales(generation, max(len(live_rows), 1), mode="w+") if dim and self._dtype == "int8" else None
+            for start in range(0, len(live_rows), self.block_size):
+                block = live_rows[start:start + self.block_size]
+                new_matrix[start:start + len(block)] = self._matrix[block]
+                if new_scales is not None:
+                    new_scales[start:start + len(block)] = self._scales[block]
+            if new_matrix is not None:
+                new_matrix.flush()
+                if new_scales is not None:
+                    new_scales.flush()
+
+            # Swap the side table in one transaction; row order is preserved
+            with self._conn:
+                self._conn.execute("DROP TABLE IF EXISTS chunks_compacted")
+                self._conn.execute("CREATE TABLE chunks_compacted AS SELECT * FROM chunks WHERE 0")
+                self._conn.execute("""
+                    INSERT INTO chunks_compacted
+                    SELECT ROW_NUMBER() OVER (ORDER BY row_id) - 1, chunk_id, document_id, user_id, content, metadata, 0
+                    FROM chunks WHERE deleted = 0
+                """)
+                self._conn.execute("DELETE FROM chunks")
+                self._conn.execute("INSERT INTO chunks SELECT * FROM chunks_compacted")
+                self._conn.execute("DROP TABLE chunks_compacted")
+                self._conn.execute("UPDATE settings SET value = ? WHERE key = 'generation'", (str(generation),))
+
+            old_generation = self._generation
+            self._load()
+            for path in (self._matrix_path(old_generation), self._scales_path(old_generation)):
+                if os.path.exists(path):
+                    os.remove(path)
+            logger.info(f"Compacted vector store to {self._live_count} rows")
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _cross_process_lock(self, operation: int):
+        """Hold the flock on ``write.lock``; re-entrant within a thread, where the outer mode wins"""
+        with self._lock:
+            if self._lock_depth == 0:
+                fcntl.flock(self._lock_file.fileno(), operation)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the write lock, working on the latest committed state.
+        
+        Re-entrant within a thread, so ``compact_if_needed`` can call ``compact``.
+        """
+        with self._cross_process_lock(fcntl.LOCK_EX):
+            # Another process may have added, deleted or compacted rows meanwhile
+            self._refresh_if_changed()
+            yield
+
+    @contextmanager
+    def _shared(self):
+        """Hold the lock in shared mode so no compaction renumbers rows under a reader"""
+        with self._cross_process_lock(fcntl.LOCK_SH):
+            self._refresh_if_changed()
+            yield
+
+    def _matrix_path(self, generation: int) -> str:
+        return os.path.join(self.persist_directory, f"vectors.{generation}.{self._dtype}")
+
+    def _scales_path(self, generation: int) -> str:
+        return os.path.join(self.persist_directory, f"scales.{generation}.float32")
+
+    def _open_matrix(self, generation: int, capacity: int, dim: int, mode: str = "r+") -> np.memmap:
+        return np.memmap(self._matrix_path(generation), dtype=self._dtype, mode=mode, shape=(capacity, dim))
+
+    def _open_scales(self, generation: int, capacity: int, mode: str = "r+") -> np.memmap:
+        return np.memmap(self._scales_path(generation), dtype=np.float32, mode=mode, shape=(capacity,))
+
+    def _setting(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _current_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _load(self):
+        """(Re)map the matrix and rebuild the tombstone mask from the side table"""
+        self._dtype = self._setting("dtype")
+        self._generation = int(self._setting("generation"))
+        dim = self._setting("dim")
+        self._dim = int(dim) if dim else None
+
+        self._row_count = self._conn.execute("SELECT COALESCE(MAX(row_id) + 1, 0) FROM chunks").fetchone()[0]
+        self._live = np.ones(self._row_count, dtype=bool)
+        for (row_id,) in self._conn.execute("SELECT row_id FROM chunks WHERE deleted = 1"):
+            self._live[row_id] = False
+        self._live_count = int(self._live.sum())
+
+        self._matrix = None
+        self._scales = None
+        self._capacity = 0
+        if self._dim and os.path.exists(self._matrix_path(self._generation)):
+            row_bytes = self._dim * np.dtype(self._dtype).itemsize
+            self._capacity = os.path.getsize(self._matrix_path(self._generation)) // row_bytes
+            self._matrix = self._open_matrix(self._generation, self._capacity, self._dim)
+            if self._dtype == "int8":
+                self._scales = self._open_scales(self._generation, self._capacity)
+
+        self._data_version = self._current_data_version()
+
+    def _refresh_if_changed(self):
+        """Reload if another process committed to the side table since we last looked"""
+        if self._current_data_version() != self._data_version:
+            self._load()
+
+    def _ensure_capacity(self, rows_needed: int):
+        if rows_needed <= self._capacity:
+            return
+
+        # Never shrink a file another process has already grown
+        row_bytes = self._dim * np.dtype(self._dtype).itemsize
+        path = self._matrix_path(self._generation)
+        on_disk = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+        capacity = max(rows_needed, self._capacity * 2, 1024, on_disk)
+        self._matrix = None
+        self._scales = None
+        with open(self._matrix_path(self._generation), "ab") as file:
+            file.truncate(capacity * self._dim * np.dtype(self._dtype).itemsize)
+        if self._dtype == "int8":
+            with open(self._scales_path(self._generation), "ab") as file:
+                file.truncate(capacity * np.dtype(np.float32).itemsize)
+
+        self._capacity = capacity
+        self._matrix = self._open_matrix(self._generation, capacity, self._dim)
+        if self._dtype == "int8":
+            self._scales = self._open_scales(self._generation, capacity)
+
+    def _write_rows(self, rows, embeddings: np.ndarray):
+        """Store one batch of (chunk_id, content, metadata); replayed chunk ids overwrite their existing row"""
+        if self._dim is None:
+            self._dim = embeddings.shape[1]
+            self._conn.execute("INSERT OR REPLACE INTO settings VALUES ('dim', ?)", (str(self._dim),))
+        elif embeddings.shape[1] != self._dim:
+            raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match index dimension {self._dim}")
+
+        chunk_ids = [chunk_id for chunk_id, _, _ in rows]
+        placeholders = ",".join("?" * len(chunk_ids))
+        existing = dict(self._conn.execute(
+            f"SELECT chunk_id, row_id FROM chunks WHERE chunk_id IN ({placeholders})", chunk_ids
+        ).fetchall())
+
+        row_ids = []
+        next_row = self._row_count
+        for chunk_id in chunk_ids:
+            if chunk_id in existing:
+                row_ids.append(existing[chunk_id])
+            else:
+                row_ids.append(next_row)
+                next_row += 1
+
+        # Vectors are flushed before the side table commits, so a crash leaves at
+        # worst unreferenced rows past the end that the next write reuses
+        self._ensure_capacity(next_row)
+        vectors, scales = self._quantize(embeddings)
+        self._matrix[row_ids] = vectors
+        self._matrix.flush()
+        if scales is not None:
+            self._scales[row_ids] = scales
+            self._scales.flush()
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO chunks (row_id, chunk_id, document_id, user_id, content, metadata, deleted) VALUES (?, ?, ?, ?, ?, ?, 0)",
+            [
+                (row_id, chunk_id, metadata["document_id"], metadata.get("user_id"), content, json.dumps(metadata))
+                for row_id, (chunk_id, content, metadata) in zip(row_ids, rows)
+            ]
+        )
+        self._conn.commit()
+        self._data_version = self._current_data_version()
+
+        if next_row > self._row_count:
+            self._live = np.concatenate([self._live, np.zeros(next_row - self._row_count, dtype=bool)])
+            self._row_count = next_row
+        self._live_count += int((~self._live[row_ids]).sum())
+        self._live[row_ids] = True
+
+    # ------------------------------------------------------------------
+    # Embedding and scoring
+    # ------------------------------------------------------------------
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return self._normalize(self.embedding_function(texts))
+
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def _quantize(self, embeddings: np.ndarray):
+        if self._dtype == "float16":
+            return embeddings.astype(np.float16), None
+
+        # Symmetric per-row int8 quantisation; the scale is reapplied at query time
+        scales = np.maximum(np.abs(embeddings).max(axis=1), 1e-12) / 127.0
+        vectors = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+        return vectors, scales.astype(np.float32)
+
+    def _top_k(self, query_embeddings: np.ndarray, k: int, candidate_rows: Optional[np.ndarray] = None):
+        """Blocked matrix product with a running argpartition top-k per query.
+        
+        Scans every row, or only ``candidate_rows`` when given. Returns one
+        (row_ids, scores) pair per query row, best first.
+        """
+        n_queries = len(query_embeddings)
+        empty = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in range(n_queries)]
+        if self._matrix is None or not self._live_count or k <= 0:
+            return empty
+
+        # (n_queries, k) running candidates per query
+        best_rows = np.zeros((n_queries, 0), dtype=np.int64)
+        best_scores = np.zeros((n_queries, 0), dtype=np.float32)
+        query_matrix = query_embeddings.T.astype(np.float32)
+        total = self._row_count if candidate_rows is None else len(candidate_rows)
+
+        for start in range(0, total, self.block_size):
+            end = min(start + self.block_size, total)
+            if candidate_rows is None:
+                block_rows = np.arange(start, end)
+                vectors = self._matrix[start:end]
+            else:
+                block_rows = candidate_rows[start:end]
+                vectors = self._matrix[block_rows]
+
+            scores = (vectors.astype(np.float32) @ query_matrix).T
+            if self._scales is not None:
+                scores *= self._scales[block_rows]
+            scores[:, ~self._live[block_rows]] = -np.inf
+
+            block_k = min(k, end - start)
+            top = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+            best_rows = np.concatenate([best_rows, block_rows[top]], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            if best_rows.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        results = []
+        for rows, row_scores in zip(best_rows, best_scores):
+            order = np.argsort(-row_scores)
+            rows, row_scores = rows[order], row_scores[order]
+            found = np.isfinite(row_scores)
+            results.append((rows[found], row_scores[found]))
+        return results
+
+    def _fetch_results(self, row_ids: np.ndarray, scores: np.ndarray) -> List[Dict]:
+        if not len(row_ids):
+            return []
+
+        placeholders = ",".join("?" * len(row_ids))
+        rows = {
+            row_id: (content, metadata)
+            for row_id, content, metadata in self._conn.execute(
+                f"SELECT row_id, content, metadata FROM chunks WHERE row_id IN ({placeholders})",
+                [int(row_id) for row_id in row_ids]
+            )
+        }
+
+        formatted_results = []
+        for row_id, score in zip(row_ids, scores):
+            content, metadata = rows[int(row_id)]
+            formatted_results.append({
+                "content": content,
+                "metadata": json.loads(metadata),
+                # Squared L2 between unit vectors, matching Chroma's default space
+                "distance": float(2.0 - 2.0 * score)
+            })
+        return formatted_results
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Memory-mapped vector store maintenance")
+    parser.add_argument("command", choices=["compact"])
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        MmapVectorStore(dtype=os.getenv("MMAP_INDEX_DTYPE", "float16")).compact()
@@ -0,0 +1,232 @@
+import asyncio
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Set
+import logging
+
+from sqlalchemy.exc import IntegrityError
+
+from .database import SessionLocal, Document, IngestCheckpoint, OrphanSuspect
+
+logger = logging.getLogger(__name__)
+
+class Reconciler:
+    """Bring the SQL document table and the vector store back in line.
+
+    * Chunks whose document has no ``Document`` row (and no ingest in progress)
+      are orphans and get deleted in batches.
+    * Ingests whose checkpoint has not been renewed for ``grace_seconds`` are
+      abandoned; their checkpoint row and chunks are deleted.
+    * ``Document`` rows without any chunks are flagged by setting
+      ``processed`` to False.
+    * The vector store is compacted if deletes left it with enough tombstones.
+
+    Vectors are written before their ``Document`` row commits, so an orphan is
+    only deleted once it has stayed orphaned for ``grace_seconds`` across
+    passes. Suspects are kept in the ``orphan_suspects`` table, so their age
+    survives restarts and is shared by every worker and the CLI. Each pass streams document ids page by page and yields between
+    pages, so it can run next to the API without holding anything up.
+    """
+
+    def __init__(self, vector_store, page_size: int = 1000, delete_batch_size: int = 100,
+                 grace_seconds: float = 300, page_pause_seconds: float = 0.01):
+        self.vector_store = vector_store
+        self.page_size = page_size
+        self.delete_batch_size = delete_batch_size
+        self.grace_seconds = grace_seconds
+        self.page_pause_seconds = page_pause_seconds
+
+    def run_once(self) -> Dict[str, int]:
+        """Run one full reconciliation pass and return what it did"""
+        stats = {"documents": 0, "vector_documents": 0, "orphans_deleted": 0, "orphans_pending": 0,
+                 "stale_ingests": 0, "flagged": 0, "compacted": 0}
+        started_at = datetime.utcnow()
+
+        stats["stale_ingests"] = self._expire_stale_checkpoints()
+
+        known_ids = self._known_document_ids()
+        stats["documents"] = len(known_ids)
+
+        vector_ids: Set[str] = set()
+        for i, document_id in enumerate(self.vector_store.iter_document_ids(page_size=self.page_size)):
+            vector_ids.add(document_id)
+            if self.page_pause_seconds and i and i % self.page_size == 0:
+                # Give serving threads a turn between pages
+                time.sleep(self.page_pause_seconds)
+        stats["vector_documents"] = len(vector_ids)
+
+        # Orphans: drop suspects that recovered, delete those past their grace period
+        suspects = self._update_suspects(vector_ids - known_ids)
+        cutoff = self._stale_cutoff()
+        expired = [document_id for document_id, first_seen in suspects.items() if first_seen <= cutoff]
+        if expired:
+            # Re-check right before deleting in case a row committed during the scan
+            expired = [document_id for document_id in expired if document_id not in self._known_document_ids()]
+        for start in range(0, len(expired), self.delete_batch_size):
+            batch = expired[start:start + self.delete_batch_size]
+            self.vector_store.delete_documents(batch)
+            self._forget_suspects(batch)
+            stats["orphans_deleted"] += len(batch)
+        stats["orphans_pending"] = len(suspects) - stats["orphans_deleted"]
+
+        # Dangling rows: documents whose vectors are missing
+        stats["flagged"] = self._flag_missing_vectors(vector_ids, started_at)
+
+        # Deletes only tombstone; the expensive rewrite happens here, off the request path
+        stats["compacted"] = int(self.vector_store.compact_if_needed())
+
+        logger.info(f"Reconciliation pass finished: {stats}")
+        return stats
+
+    def _stale_cutoff(self) -> datetime:
+        """Suspects first seen and ingest leases renewed before this are past their grace"""
+        return datetime.utcnow() - timedelta(seconds=self.grace_seconds)
+
+    def _update_suspects(self, orphan_ids: Set[str]) -> Dict[str, datetime]:
+        """Record newly found orphans, forget recovered ones; returns when each was first seen"""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            suspects = {row.document_id: row.first_seen for row in db.query(OrphanSuspect).yield_per(self.page_size)}
+            recovered = [document_id for document_id in suspects if document_id not in orphan_ids]
+            for start in range(0, len(recovered), self.delete_batch_size):
+                db.query(OrphanSuspect).filter(
+                    OrphanSuspect.document_id.in_(recovered[start:start + self.delete_batch_size])
+                ).delete(synchronize_session=False)
+            db.add_all(
+                OrphanSuspect(document_id=document_id, first_seen=now)
+                for document_id in orphan_ids if document_id not in suspects
+            )
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker's pass recorded some of them first; the next pass catches up
+                db.rollback()
+            return {document_id: suspects.get(document_id, now) for document_id in orphan_ids}
+        finally:
+            db.close()
+
+    def _forget_suspects(self, document_ids: List[str]):
+        db = SessionLocal()
+        try:
+            db.query(OrphanSuspect).filter(OrphanSuspect.document_id.in_(document_ids)).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _known_document_ids(self) -> Set[str]:
+        """Document ids with a row, plus ingests still writing their chunks"""
+        db = SessionLocal()
+        try:
+            known_ids = {row[0] for row in db.query(Document.id).yield_per(self.page_size)}
+            known_ids.update(
+                row[0] for row in db.query(IngestCheckpoint.document_id)
+                .filter(
+                    IngestCheckpoint.status == "in_progress",
+                    IngestCheckpoint.updated_at >= self._stale_cutoff()
+                )
+                .yield_per(self.page_size)
+            )
+            return known_ids
+        finally:
+            db.close()
+
+    def _expire_stale_checkpoints(self) -> int:
+        """Delete abandoned ingests together with the chunks they had written"""
+        # updated_at is renewed on every committed batch, so older means abandoned
+        cutoff = self._stale_cutoff()
+        db = SessionLocal()
+        try:
+            stale_ids = [
+                row[0] for row in db.query(IngestCheckpoint.document_id).filter(
+                    IngestCheckpoint.status == "in_progress",
+                    IngestCheckpoint.updated_at < cutoff
+                )
+            ]
+            expired = []
+            for document_id in stale_ids:
+                # Conditional delete: a retried upload may have claimed the ingest meanwhile
+                deleted = db.query(IngestCheckpoint).filter(
+                    IngestCheckpoint.document_id == document_id,
+                    IngestCheckpoint.status == "in_progress",
+                    IngestCheckpoint.updated_at < cutoff
+                ).delete(synchronize_session=False)
+                db.commit()
+                if deleted:
+                    expired.append(document_id)
+        finally:
+            db.close()
+
+        for start in range(0, len(expired), self.delete_batch_size):
+            self.vector_store.delete_documents(expired[start:start + self.delete_batch_size])
+        if expired:
+            logger.warning(f"Deleted {len(expired)} abandoned ingests")
+        return len(expired)
+
+    def _flag_missing_vectors(self, vector_ids: Set[str], scan_started_at: datetime) -> int:
+        db = SessionLocal()
+        try:
+            flagged = 0
+            # Rows committed after the scan started may have vectors the scan missed
+            documents = db.query(Document).filter(
+                Document.processed == True,
+                Document.upload_date < scan_started_at
+            )
+            for document in documents.yield_per(self.page_size):
+                # The scan can skip chunks deleted under it, so confirm before flagging
+                if document.id not in vector_ids and not self.vector_store.has_document(document.id):
+                    document.processed = False
+                    flagged += 1
+            if flagged:
+                db.commit()
+                logger.warning(f"Flagged {flagged} documents with missing vectors")
+            return flagged
+        finally:
+            db.close()
+
+    async def run_forever(self, interval_seconds: float):
+        """Background loop; each pass runs in a worker thread off the event loop"""
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"Error during reconciliation pass: {e}")
+            await asyncio.sleep(interval_seconds)
+
+def main():
+    from .vector_store import create_vector_store
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Reconcile the document table with the vector store")
+    parser.add_argument("--grace", type=float, default=300,
+                        help="Seconds a document must stay orphaned before its chunks are deleted")
+    parser.add_argument("--dry-run", action="store_true", help="Report orphans without deleting or flagging")
+    parser.add_argument("--wait", action="store_true",
+                        help="If orphans are still in their grace period, wait it out and run a second pass")
+    args = parser.parse_args()
+
+    reconciler = Reconciler(create_vector_store(), grace_seconds=args.grace)
+    if args.dry_run:
+        known_ids = reconciler._known_document_ids()
+        vector_ids = set(reconciler.vector_store.iter_document_ids(page_size=reconciler.page_size))
+        stats = {
+            "orphan_documents": sorted(vector_ids - known_ids),
+            "documents_missing_vectors": sorted(
+                document_id for document_id in known_ids - vector_ids
+                if not reconciler.vector_store.has_document(document_id)
+            ),
+        }
+    else:
+        stats = reconciler.run_once()
+        if args.wait and stats["orphans_pending"]:
+            # Everything this pass found is past its grace period one grace period later
+            time.sleep(args.grace)
+            orphans_deleted = stats["orphans_deleted"]
+            stats = reconciler.run_once()
+            stats["orphans_deleted"] += orphans_deleted
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+from pydantic import BaseModel
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+
+from .database import Document
+
+class SearchFilters(BaseModel):
+    """Restricts a query to a subset of the knowledge base"""
+    document_ids: Optional[List[str]] = None
+    filename_pattern: Optional[str] = None  # Glob, e.g. "manual*.pdf"
+    chunk_types: Optional[List[str]] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
+def _glob_to_like(pattern: str) -> str:
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%").replace("?", "_")
+
+def build_where(db, filters: Optional[SearchFilters]) -> Optional[Dict[str, Any]]:
+    """Translate search filters into a Chroma-style ``where`` clause.
+
+    Filename and upload date filters live on the ``documents`` table, so they are
+    resolved there (using its indexes) into a ``document_id`` set that is pushed
+    down together with the chunk-level conditions. Returns None when nothing is
+    filtered.
+    """
+    if filters is None:
+        return None
+
+    conditions = []
+    document_ids = filters.document_ids
+
+    if filters.filename_pattern or filters.uploaded_after or filters.uploaded_before:
+        query = db.query(Document.id)
+        if filters.filename_pattern:
+            query = query.filter(Document.filename.like(_glob_to_like(filters.filename_pattern), escape="\\"))
+        if filters.uploaded_after:
+            query = query.filter(Document.upload_date >= filters.uploaded_after)
+        if filters.uploaded_before:
+            query = query.filter(Document.upload_date <= filters.uploaded_before)
+        matching_ids = [row[0] for row in query.all()]
+        if document_ids is not None:
+            allowed = set(document_ids)
+            matching_ids = [document_id for document_id in matching_ids if document_id in allowed]
+        document_ids = matching_ids
+
+    if document_ids is not None:
+        conditions.append({"document_id": {"$in": list(document_ids)}})
+    if filters.chunk_types:
+        conditions.append({"chunk_type": {"$in": list(filters.chunk_types)}})
+    if filters.page_from is not None:
+        conditions.append({"page_number": {"$gte": filters.page_from}})
+    if filters.page_to is not None:
+        conditions.append({"page_number": {"$lte": filters.page_to}})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+def is_empty_scope(where: Optional[Dict[str, Any]]) -> bool:
+    """True if the clause restricts the search to an empty document set"""
+    if not where:
+        return False
+    conditions = where.get("$and", [where])
+    return any(condition.get("document_id", {}).get("$in") == [] for condition in conditions)
@@ -0,0 +1,233 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import numpy as np
+from datetime import datetime
+import argparse
+import json
+from functools import partial
+from typing import Dict, Any, Iterator, List, Callable, Tuple
+import logging
+
+from .database import SessionLocal, Document
+from .mmap_vector_store import MmapVectorStore
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = "2"
+
+# Document table columns carried in the snapshot, as JSON in the metadata column
+DOCUMENT_COLUMNS = ["id", "user_id", "filename", "file_type", "upload_date", "processed", "doc_metadata"]
+
+# "collection" values: chunks, per-document summaries (Chroma only) and Document rows
+CHUNKS = "knowledge_documents"
+SUMMARIES = "knowledge_document_summaries"
+DOCUMENTS = "documents"
+
+def _snapshot_schema(dim: int, document_index_coverage: str) -> pa.Schema:
+    return pa.schema(
+        [
+            ("collection", pa.string()),
+            ("id", pa.string()),
+            ("document", pa.string()),
+            ("metadata", pa.string()),  # JSON; Chroma metadata values are scalars
+            ("embedding", pa.list_(pa.float32(), dim)),  # Null for Document rows
+        ],
+        metadata={
+            "snapshot_version": SNAPSHOT_VERSION,
+            # Whether the summaries cover every document, see VectorStore.set_document_index_coverage
+            "document_index": document_index_coverage,
+        }
+    )
+
+def _document_row(doc: Document) -> Dict[str, Any]:
+    return {
+        column: (value.isoformat() if isinstance(value, datetime) else value)
+        for column, value in ((column, getattr(doc, column)) for column in DOCUMENT_COLUMNS)
+    }
+
+def _iter_document_pages(page_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Page through the Document table by primary key"""
+    db = SessionLocal()
+    try:
+        last_id = None
+        while True:
+            query = db.query(Document).order_by(Document.id)
+            if last_id is not None:
+                query = query.filter(Document.id > last_id)
+            page = [_document_row(doc) for doc in query.limit(page_size)]
+            if not page:
+                return
+            yield page
+            last_id = page[-1]["id"]
+            db.expunge_all()
+    finally:
+        db.close()
+
+def _merge_documents(rows: List[Dict[str, Any]]):
+    db = SessionLocal()
+    try:
+        for row in rows:
+            if row.get("upload_date"):
+                row["upload_date"] = datetime.fromisoformat(row["upload_date"])
+            db.merge(Document(**row))
+        db.commit()
+    finally:
+        db.close()
+
+def _iter_collection(collection, page_size: int) -> Iterator[Dict[str, Any]]:
+    """Page through a Chroma collection including its stored embeddings"""
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+def _snapshot_collections(vector_store) -> Dict[str, Tuple[Callable, Callable]]:
+    """Collection name -> (page iterator, upsert) for the store's backend.
+
+    The mmap backend keeps no document summaries: its snapshots carry chunks
+    only, and it skips summary rows on import.
+    """
+    if isinstance(vector_store, MmapVectorStore):
+        return {CHUNKS: (vector_store.iter_chunks, vector_store.upsert_chunks)}
+    return {
+        name: (partial(_iter_collection, collection), collection.upsert)
+        for name, collection in ((CHUNKS, vector_store.collection), (SUMMARIES, vector_store.document_collection))
+    }
+
+def _document_index_coverage(vector_store) -> str:
+    if isinstance(vector_store, MmapVectorStore):
+        return "partial"
+    return (vector_store.document_collection.metadata or {}).get("coverage", "partial")
+
+def export_snapshot(vector_store, path: str, page_size: int = 1000) -> Dict[str, int]:
+    """Write all chunks, metadata and embeddings plus the Document rows to one Parquet file.
+
+    Chunks and Document rows are read page by page and written as separate row
+    groups, so the snapshot never has to fit in memory. Document rows come last
+    and have no embedding.
+    """
+    stats = {"documents": 0, "chunks": 0, "summaries": 0}
+    coverage = _document_index_coverage(vector_store)
+    writer = None
+    try:
+        for name, (iter_pages, _) in _snapshot_collections(vector_store).items():
+            for page in iter_pages(page_size):
+                embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, _snapshot_schema(embeddings.shape[1], coverage), compression="zstd")
+
+                count = len(page["ids"])
+                writer.write_table(pa.Table.from_arrays(
+                    [
+                        pa.array([name] * count),
+                        pa.array(page["ids"]),
+                        pa.array(page["documents"]),
+                        pa.array([json.dumps(metadata) for metadata in page["metadatas"]]),
+                        pa.FixedSizeListArray.from_arrays(pa.array(embeddings.ravel()), embeddings.shape[1]),
+                    ],
+                    schema=writer.schema
+                ))
+                stats["chunks" if name == CHUNKS else "summaries"] += count
+
+        if writer is None:
+            # Empty vector store: the embedding width is unknown, any will do
+            writer = pq.ParquetWriter(path, _snapshot_schema(1, coverage), compression="zstd")
+
+        for page in _iter_document_pages(page_size):
+            count = len(page)
+            writer.write_table(pa.Table.from_arrays(
+                [
+                    pa.array([DOCUMENTS] * count),
+                    pa.array([row["id"] for row in page]),
+                    pa.nulls(count, pa.string()),
+                    pa.array([json.dumps(row) for row in page]),
+                    pa.nulls(count, writer.schema.field("embedding").type),
+                ],
+                schema=writer.schema
+            ))
+            stats["documents"] += count
+    finally:
+        if writer is not None:
+            writer.close()
+
+    logger.info(f"Exported snapshot to {path}: {stats}")
+    return stats
+
+def import_snapshot(vector_store, path: str) -> Dict[str, int]:
+    """Bulk-load a snapshot written by ``export_snapshot`` without re-embedding.
+
+    Row groups are streamed in batches of the vector store's batch size and
+    upserted with their stored embeddings, so importing twice is harmless.
+    """
+    snapshot = pq.ParquetFile(path)
+    file_metadata = snapshot.schema_arrow.metadata or {}
+    version = file_metadata.get(b"snapshot_version", b"").decode()
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {version or 'missing'}")
+
+    collections = _snapshot_collections(vector_store)
+    stats = {"documents": 0, "chunks": 0, "summaries": 0, "skipped": 0}
+    dim = snapshot.schema_arrow.field("embedding").type.list_size
+
+    for batch in snapshot.iter_batches(batch_size=vector_store.batch_size):
+        is_document = pc.equal(batch.column("collection"), DOCUMENTS)
+        chunks = batch.filter(pc.invert(is_document))
+        names = chunks.column("collection").to_pylist()
+        ids = chunks.column("id").to_pylist()
+        texts = chunks.column("document").to_pylist()
+        metadatas = [json.loads(metadata) for metadata in chunks.column("metadata").to_pylist()]
+        embeddings = chunks.column("embedding").flatten().to_numpy(zero_copy_only=False).reshape(len(chunks), dim)
+
+        # A batch may straddle the boundaries between the collections
+        for name in dict.fromkeys(names):
+            rows = [i for i, row_name in enumerate(names) if row_name == name]
+            if name not in collections:
+                # Summaries restored into a backend without a summary index
+                stats["skipped"] += len(rows)
+                continue
+            _, upsert = collections[name]
+            upsert(
+                ids=[ids[i] for i in rows],
+                embeddings=embeddings[rows].tolist(),
+                documents=[texts[i] for i in rows],
+                metadatas=[metadatas[i] for i in rows]
+            )
+            stats["chunks" if name == CHUNKS else "summaries"] += len(rows)
+
+        # Document rows follow all chunks in the file, so a document never
+        # appears before its chunks
+        documents = [json.loads(row) for row in batch.filter(is_document).column("metadata").to_pylist()]
+        if documents:
+            _merge_documents(documents)
+            stats["documents"] += len(documents)
+
+    if (stats["chunks"] and file_metadata.get(b"document_index") != b"complete"
+            and not isinstance(vector_store, MmapVectorStore)):
+        # Imported chunks may lack summaries; keep two-stage retrieval off until a rebuild
+        vector_store.set_document_index_coverage(False)
+
+    logger.info(f"Imported snapshot from {path}: {stats}")
+    return stats
+
+def main():
+    from .vector_store import create_vector_store
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export or import a knowledge base snapshot")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot file (Parquet)")
+    args = parser.parse_args()
+
+    vector_store = create_vector_store()
+    if args.command == "export":
+        stats = export_snapshot(vector_store, args.path)
+    else:
+        stats = import_snapshot(vector_store, args.path)
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
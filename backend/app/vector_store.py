@@ -1,88 +1,283 @@
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
+from collections import Counter
+import numpy as np
 import uuid
 import os
-from typing import List, Dict, Any
+import re
+from typing import List, Dict, Any, Optional, Callable, Iterator
 import logging
 
+from .search_filters import is_empty_scope
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_BATCH_SIZE = int(os.getenv("CHROMA_BATCH_SIZE", "256"))
+
+# Two-stage retrieval: pick the top documents first, then search only their chunks
+HIERARCHICAL_SEARCH = os.getenv("HIERARCHICAL_SEARCH", "true").lower() == "true"
+HIERARCHICAL_MIN_DOCUMENTS = int(os.getenv("HIERARCHICAL_MIN_DOCUMENTS", "200"))
+SEARCH_TOP_DOCUMENTS = int(os.getenv("SEARCH_TOP_DOCUMENTS", "20"))
+
+SUMMARY_COLLECTION = "knowledge_document_summaries"
+
+STOP_WORDS = {
+    "the", "and", "for", "that", "this", "with", "from", "are", "was", "were", "been", "have",
+    "has", "had", "not", "but", "you", "your", "they", "their", "them", "will", "would", "can",
+    "could", "should", "there", "which", "what", "when", "where", "who", "how", "all", "any",
+    "into", "than", "then", "also", "its", "our", "more", "such", "may", "these", "those", "about"
+}
+
+def count_terms(counts: Counter, text: str):
+    """Add the non-trivial words of ``text`` to a running term count"""
+    counts.update(
+        word for word in re.findall(r"[a-z][a-z0-9\-]{2,}", text.lower())
+        if word not in STOP_WORDS
+    )
+
 class VectorStore:
-    def __init__(self):
-        self.persist_directory = "./chroma_db"
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, hierarchical: bool = HIERARCHICAL_SEARCH,
+                 hierarchical_min_documents: int = HIERARCHICAL_MIN_DOCUMENTS,
+                 top_documents: int = SEARCH_TOP_DOCUMENTS):
+        self.persist_directory = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
         self.client = chromadb.PersistentClient(path=self.persist_directory)
         
-        # Use ChromaDB's default embedding function with error handling
+        # Never send more than Chroma accepts in a single call
+        max_batch_size = getattr(self.client, "max_batch_size", None)
+        self.batch_size = min(batch_size, max_batch_size) if max_batch_size else batch_size
+        self.hierarchical = hierarchical
+        self.hierarchical_min_documents = hierarchical_min_documents
+        self.top_documents = top_documents
+        
+        # Use ChromaDB's default embedding function with error handling.
+        # It is also called directly so chunk embeddings can be averaged per document
         try:
+            self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
             self.collection = self.client.get_or_create_collection(
                 name="knowledge_documents",
-                metadata={"description": "Personal knowledge documents"}
+                metadata={"description": "Personal knowledge documents"},
+                embedding_function=self.embedding_function
+            )
+            # One entry per document: centroid of its chunk embeddings plus key terms.
+            # No metadata here: get_or_create would overwrite the stored coverage flag
+            self.document_collection = self.client.get_or_create_collection(
+                name=SUMMARY_COLLECTION,
+                embedding_function=self.embedding_function
             )
+            if "coverage" not in (self.document_collection.metadata or {}):
+                # New, or created before coverage was tracked: complete only if nothing is indexed yet
+                self.set_document_index_coverage(self.collection.count() == 0)
+            self._document_index_complete = self.document_collection.metadata["coverage"] == "complete"
+            if self.hierarchical and not self._document_index_complete:
+                logger.warning("Two-stage retrieval is off until every document has a summary; "
+                               "run `python -m app.vector_store rebuild-document-index`")
             logger.info("Vector store initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing vector store: {e}")
             raise
     
-    def add_documents(self, chunks: List[Dict], document_id: str, user_id: str, filename: str):
-        """Add document chunks to vector store"""
+    def add_documents(self, chunks: List[Dict], document_id: str, user_id: str, filename: str,
+                      extra_metadata: Optional[Dict[str, Any]] = None, start_index: int = 0,
+                      on_batch_committed: Optional[Callable[[int], None]] = None):
+        """Add document chunks to vector store in batches.
+        
+        Chunks before ``start_index`` are assumed to be stored already, which lets an
+        interrupted ingest resume. ``on_batch_committed`` is called with the number of
+        chunks stored so far after every batch, so callers can checkpoint progress.
+        """
         if not chunks:
             logger.warning("No chunks to add to vector store")
             return
-            
-        ids = []
-        documents = []
-        metadatas = []
         
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{document_id}_{i}"
-            ids.append(chunk_id)
-            documents.append(chunk["content"])
+        embedding_sum = self._stored_embedding_sum(document_id, start_index)
+        
+        for batch_start in range(start_index, len(chunks), self.batch_size):
+            batch_end = min(batch_start + self.batch_size, len(chunks))
+            ids = []
+            documents = []
+            metadatas = []
+            
+            for i in range(batch_start, batch_end):
+                chunk = chunks[i]
+                ids.append(f"{document_id}_{i}")
+                documents.append(chunk["content"])
+                
+                metadata = {
+                    "document_id": document_id,
+                    "user_id": user_id,
+                    "filename": filename,
+                    "chunk_index": i,
+                    "chunk_type": chunk.get("type", "text"),
+                    "page_number": chunk.get("page_number", 0)
+                }
+                if chunk.get("attachment"):
+                    metadata["attachment"] = chunk["attachment"]
+                if extra_metadata:
+                    # Chroma only accepts scalar metadata values
+                    metadata.update({k: v for k, v in extra_metadata.items() if v is not None})
+                metadatas.append(metadata)
             
-            metadata = {
-                "document_id": document_id,
-                "user_id": user_id,
-                "filename": filename,
-                "chunk_index": i,
-                "chunk_type": chunk.get("type", "text"),
-                "page_number": chunk.get("page_number", 0)
-            }
-            metadatas.append(metadata)
+            try:
+                # Upsert so replaying a batch after a crash is idempotent
+                embeddings = self.embedding_function(documents)
+                self.collection.upsert(
+                    ids=ids,
+                    embeddings=embeddings,
+                    documents=documents,
+                    metadatas=metadatas
+                )
+                embedding_sum = embedding_sum + np.asarray(embeddings, dtype=np.float32).sum(axis=0)
+            except Exception as e:
+                logger.error(f"Error adding documents to vector store (chunks {batch_start}-{batch_end}): {e}")
+                raise
+            
+            # The next batch is only built once this one is stored, bounding memory use
+            if on_batch_committed:
+                on_batch_committed(batch_end)
+        
+        term_counts = Counter()
+        for chunk in chunks:
+            count_terms(term_counts, chunk["content"])
+        self._add_document_summary(document_id, user_id, filename, embedding_sum, len(chunks),
+                                   term_counts, chunks[0]["content"])
+        logger.info(f"Successfully added {len(chunks) - start_index} chunks to vector store")
+    
+    def _stored_embedding_sum(self, document_id: str, count: int):
+        """Sum of the embeddings of a document's first ``count`` (already stored) chunks"""
+        if count <= 0:
+            return 0
+        stored = self.collection.get(ids=[f"{document_id}_{i}" for i in range(count)], include=["embeddings"])
+        return np.asarray(stored["embeddings"], dtype=np.float32).sum(axis=0)
+    
+    def _add_document_summary(self, document_id: str, user_id: str, filename: str, embedding_sum,
+                              chunk_count: int, term_counts: Counter, preview: str):
+        """Write the document-level entry used by the first retrieval stage"""
+        centroid = np.asarray(embedding_sum, dtype=np.float32) / chunk_count
+        centroid = centroid / max(float(np.linalg.norm(centroid)), 1e-12)
+        key_terms = [word for word, _ in term_counts.most_common(20)]
         
         try:
-            # Add to collection - ChromaDB will handle embeddings automatically
-            self.collection.add(
-                ids=ids,
-                documents=documents,
-                metadatas=metadatas
+            self.document_collection.upsert(
+                ids=[document_id],
+                embeddings=[centroid.tolist()],
+                documents=[f"{filename}\n{' '.join(key_terms)}\n{preview[:500]}"],
+                metadatas=[{
+                    "document_id": document_id,
+                    "user_id": user_id,
+                    "filename": filename,
+                    "chunk_count": chunk_count,
+                    "key_terms": ", ".join(key_terms)
+                }]
             )
-            logger.info(f"Successfully added {len(chunks)} chunks to vector store")
         except Exception as e:
-            logger.error(f"Error adding documents to vector store: {e}")
+            logger.error(f"Error adding document summary to vector store: {e}")
             raise
     
-    def search(self, query: str, user_id: str, n_results: int = 5) -> List[Dict]:
-        """Search for relevant documents"""
+    def rebuild_document_index(self, page_size: int = 1000):
+        """Backfill document summaries for chunks indexed before the summary index existed"""
+        documents: Dict[str, Dict[str, Any]] = {}
+        offset = 0
+        
+        # Only running sums and term counts are kept per document, not chunk texts
+        while True:
+            page = self.collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            for embedding, content, metadata in zip(page["embeddings"], page["documents"], page["metadatas"]):
+                document = documents.setdefault(metadata["document_id"], {
+                    "metadata": metadata, "embedding_sum": 0, "chunk_count": 0,
+                    "term_counts": Counter(), "preview": content
+                })
+                document["embedding_sum"] = document["embedding_sum"] + np.asarray(embedding, dtype=np.float32)
+                document["chunk_count"] += 1
+                count_terms(document["term_counts"], content)
+            offset += len(page["ids"])
+        
+        for document_id, document in documents.items():
+            self._add_document_summary(
+                document_id, document["metadata"]["user_id"], document["metadata"]["filename"],
+                document["embedding_sum"], document["chunk_count"], document["term_counts"], document["preview"]
+            )
+        
+        self.set_document_index_coverage(True)
+        logger.info(f"Rebuilt document index for {len(documents)} documents")
+    
+    def set_document_index_coverage(self, complete: bool):
+        """Record whether every stored document has a summary; two-stage retrieval requires it"""
+        self.document_collection.modify(metadata={
+            "description": "Per-document summaries for two-stage retrieval",
+            "coverage": "complete" if complete else "partial"
+        })
+        self._document_index_complete = complete
+    
+    def search(self, query: str, user_id: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """Search for relevant documents, optionally restricted by a metadata ``where`` clause"""
         try:
-            # Search in vector store - ChromaDB handles embedding internally
+            return self.search_many([query], user_id, n_results=n_results, where=where)[0]
+        except Exception as e:
+            logger.error(f"Error searching vector store: {e}")
+            return []
+    
+    def search_many(self, queries: List[str], user_id: str, n_results: int = 5,
+                    where: Optional[Dict[str, Any]] = None) -> List[List[Dict]]:
+        """Search for several queries with one embedding pass and one index query"""
+        if not queries:
+            return []
+        if is_empty_scope(where):
+            return [[] for _ in queries]
+        
+        # Embed all query texts in one batch; both retrieval stages reuse the embeddings
+        query_embeddings = self.embedding_function(queries)
+        
+        # An explicit scope already narrows the candidates, so only unscoped
+        # searches over a large corpus go through the document index first.
+        # Each query keeps its own candidate set; queries that picked the same
+        # documents share one stage-two call.
+        groups: Dict[tuple, List[int]] = {}
+        if not where and self._use_document_index():
+            document_hits = self.document_collection.query(
+                query_embeddings=query_embeddings,
+                n_results=self.top_documents,
+                include=["distances"]
+            )
+            for q, hits in enumerate(document_hits['ids']):
+                groups.setdefault(tuple(sorted(set(hits))), []).append(q)
+        else:
+            groups[()] = list(range(len(queries)))
+        
+        all_results: List[List[Dict]] = [[] for _ in queries]
+        for candidate_ids, indices in groups.items():
+            group_where = {"document_id": {"$in": list(candidate_ids)}} if candidate_ids else where
+            # The where clause is applied by Chroma's metadata index before the vector search
             # Removed user filtering since no authentication
             results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results
+                query_embeddings=[query_embeddings[q] for q in indices],
+                n_results=n_results,
+                where=group_where or None
             )
             
-            formatted_results = []
-            if results['documents']:
-                for i, doc in enumerate(results['documents'][0]):
-                    formatted_results.append({
-                        "content": doc,
-                        "metadata": results['metadatas'][0][i],
-                        "distance": results['distances'][0][i] if results['distances'] else 0
-                    })
-            
-            return formatted_results
-        except Exception as e:
-            logger.error(f"Error searching vector store: {e}")
-            return []
+            for position, q in enumerate(indices):
+                formatted_results = []
+                if results['documents']:
+                    for i, doc in enumerate(results['documents'][position]):
+                        formatted_results.append({
+                            "content": doc,
+                            "metadata": results['metadatas'][position][i],
+                            "distance": results['distances'][position][i] if results['distances'] else 0
+                        })
+                all_results[q] = formatted_results
+        
+        return all_results
+    
+    def _use_document_index(self) -> bool:
+        if not self.hierarchical or self.document_collection.count() < self.hierarchical_min_documents:
+            return False
+        if not self._document_index_complete:
+            # A rebuild in another process may have completed the summaries since
+            metadata = self.client.get_collection(SUMMARY_COLLECTION, embedding_function=self.embedding_function).metadata
+            self._document_index_complete = (metadata or {}).get("coverage") == "complete"
+        return self._document_index_complete
     
     def delete_document(self, document_id: str, user_id: str):
         """Delete all chunks of a document"""
@@ -91,6 +286,57 @@ class VectorStore:
             results = self.collection.get(where={"document_id": document_id})
             if results['ids']:
                 self.collection.delete(ids=results['ids'])
+            self.document_collection.delete(ids=[document_id])
+            if results['ids']:
                 logger.info(f"Deleted document {document_id} from vector store")
         except Exception as e:
-            logger.error(f"Error deleting document from vector store: {e}")
\ No newline at end of file
+            logger.error(f"Error deleting document from vector store: {e}")
+    
+    def has_document(self, document_id: str) -> bool:
+        """True if at least one chunk of the document is stored"""
+        return bool(self.collection.get(where={"document_id": document_id}, limit=1, include=[])["ids"])
+    
+    def iter_document_ids(self, page_size: int = 1000) -> Iterator[str]:
+        """Stream the document id of every stored chunk, one page at a time.
+        
+        Offset paging: chunks deleted during the scan can shift later ones past
+        the cursor, so an id missing from the stream is not proof of absence.
+        """
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return
+            for metadata in page["metadatas"]:
+                yield metadata["document_id"]
+            offset += len(page["ids"])
+    
+    def delete_documents(self, document_ids: List[str]):
+        """Delete all chunks of several documents in one call; errors are raised"""
+        if not document_ids:
+            return
+        self.collection.delete(where={"document_id": {"$in": list(document_ids)}})
+        self.document_collection.delete(ids=list(document_ids))
+        logger.info(f"Deleted {len(document_ids)} documents from vector store")
+    
+    def compact_if_needed(self) -> bool:
+        """Chroma reclaims deleted entries itself; nothing to do"""
+        return False
+
+def create_vector_store():
+    """Build the backend selected by ``VECTOR_BACKEND``; shared by the API and the CLIs"""
+    if os.getenv("VECTOR_BACKEND", "chroma") == "mmap":
+        from .mmap_vector_store import MmapVectorStore
+        return MmapVectorStore(dtype=os.getenv("MMAP_INDEX_DTYPE", "float16"))
+    return VectorStore()
+
+if __name__ == "__main__":
+    import argparse
+    
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Vector store maintenance")
+    parser.add_argument("command", choices=["rebuild-document-index"])
+    args = parser.parse_args()
+    
+    if args.command == "rebuild-document-index":
+        VectorStore().rebuild_document_index()
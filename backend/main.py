@@ -4,18 +4,23 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 import shutil
+import hashlib
+import asyncio
 import logging
 from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
 
 # Load environment variables from .env file
 load_dotenv()
 
-from app.database import get_db, Document
-from app.vector_store import VectorStore
+from app.database import get_db, Document, IngestCheckpoint
+from app.vector_store import create_vector_store
 from app.agent import KnowledgeAgent
 from app.document_processor import DocumentProcessor
+from app.search_filters import SearchFilters, build_where
+from app.reconciler import Reconciler
 
 # Disable ChromaDB telemetry
 os.environ["ANONYMIZED_TELEMENTRY"] = "false"
@@ -32,21 +37,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "500"))
+QUERY_BATCH_CONCURRENCY = int(os.getenv("QUERY_BATCH_CONCURRENCY", "8"))
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("RECONCILE_INTERVAL_SECONDS", "3600"))  # 0 disables
+# An in-progress ingest whose checkpoint hasn't advanced for this long is treated as interrupted
+INGEST_LEASE_SECONDS = int(os.getenv("INGEST_LEASE_SECONDS", "120"))
+
 # Initialize components
-vector_store = VectorStore()
+vector_store = create_vector_store()
 document_processor = DocumentProcessor()
 knowledge_agent = KnowledgeAgent(vector_store)
+reconciler = Reconciler(vector_store)
+
+@app.on_event("startup")
+async def start_reconciler():
+    # Keeps SQLite and the vector store in line without blocking requests
+    if RECONCILE_INTERVAL_SECONDS > 0:
+        app.state.reconciler_task = asyncio.create_task(reconciler.run_forever(RECONCILE_INTERVAL_SECONDS))
 
 # Pydantic models
 class QueryRequest(BaseModel):
     question: str
     context: Optional[Dict[str, Any]] = None
+    filters: Optional[SearchFilters] = None
 
 class QueryResponse(BaseModel):
     answer: str
     sources: List[Dict[str, str]]
     conversation_id: str
 
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+
+class BatchQueryItem(BaseModel):
+    answer: str
+    sources: List[Dict[str, str]]
+    conversation_id: str
+    error: Optional[str] = None
+
 class DocumentResponse(BaseModel):
     id: str
     filename: str
@@ -78,17 +106,30 @@ async def upload_document(file: UploadFile = File(...)):
             buffer.write(content)
         
         # Process document
-        document_id = str(uuid.uuid4())
         chunks = await document_processor.process_document(temp_path, file.filename)
         
         if not chunks:
             raise HTTPException(status_code=400, detail="No content could be extracted from the document")
         
+        db = next(get_db())
+        checkpoint = _get_or_create_checkpoint(db, hashlib.sha256(content).hexdigest(), file.filename, len(chunks))
+        document_id = checkpoint.document_id
+        if checkpoint.committed_chunks:
+            logging.info(f"Resuming ingest of {file.filename} from chunk {checkpoint.committed_chunks}")
+        
+        def record_progress(committed_chunks: int):
+            # Also renews the lease through updated_at
+            checkpoint.committed_chunks = committed_chunks
+            db.commit()
+        
         # Store in vector database (using "default" as user_id since no auth)
-        vector_store.add_documents(chunks, document_id, "default", file.filename)
+        vector_store.add_documents(
+            chunks, document_id, "default", file.filename,
+            start_index=checkpoint.committed_chunks,
+            on_batch_committed=record_progress
+        )
         
-        # Save document metadata
-        db = next(get_db())
+        # Save document metadata together with the completed checkpoint
         db_document = Document(
             id=document_id,
             user_id="default",
@@ -98,6 +139,7 @@ async def upload_document(file: UploadFile = File(...)):
             processed=True
         )
         db.add(db_document)
+        checkpoint.status = "completed"
         db.commit()
         
         # Clean up
@@ -106,14 +148,76 @@ async def upload_document(file: UploadFile = File(...)):
         return {"message": "Document uploaded successfully", "document_id": document_id, "chunks_processed": len(chunks)}
     
     except HTTPException:
+        if 'temp_path' in locals() and os.path.exists(temp_path):
+            os.remove(temp_path)
         raise
     except Exception as e:
         # Clean up temp file if it exists
         if 'temp_path' in locals() and os.path.exists(temp_path):
             os.remove(temp_path)
+        if 'checkpoint' in locals():
+            _release_checkpoint(db, checkpoint)
         logging.error(f"Error uploading document: {e}")
         raise HTTPException(status_code=500, detail=f"Document upload failed: {str(e)}")
 
+def _get_or_create_checkpoint(db, content_hash: str, filename: str, total_chunks: int) -> IngestCheckpoint:
+    """Claim an interrupted ingest of the same content to resume, or start a new one.
+    
+    Raises 409 if another request is currently ingesting the same content.
+    """
+    conflict = HTTPException(status_code=409, detail="This file is already being uploaded; retry once it finishes")
+    checkpoint = db.query(IngestCheckpoint).filter(
+        IngestCheckpoint.content_hash == content_hash,
+        IngestCheckpoint.status == "in_progress"
+    ).first()
+    
+    if checkpoint:
+        # Conditional update: only one request can take over a lease that has expired
+        claimed = db.query(IngestCheckpoint).filter(
+            IngestCheckpoint.document_id == checkpoint.document_id,
+            IngestCheckpoint.status == "in_progress",
+            IngestCheckpoint.updated_at < datetime.utcnow() - timedelta(seconds=INGEST_LEASE_SECONDS)
+        ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            raise conflict
+        db.refresh(checkpoint)
+    
+    if checkpoint and checkpoint.total_chunks != total_chunks:
+        # Chunking changed since the interrupted attempt; its chunk ids can't be reused
+        vector_store.delete_document(checkpoint.document_id, "default")
+        db.delete(checkpoint)
+        db.commit()
+        checkpoint = None
+    
+    if checkpoint is None:
+        checkpoint = IngestCheckpoint(
+            document_id=str(uuid.uuid4()),
+            content_hash=content_hash,
+            filename=filename,
+            total_chunks=total_chunks,
+            committed_chunks=0,
+            status="in_progress"
+        )
+        db.add(checkpoint)
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent upload of the same content created its checkpoint first
+            db.rollback()
+            raise conflict
+    
+    return checkpoint
+
+def _release_checkpoint(db, checkpoint: IngestCheckpoint):
+    """Expire the lease of a failed ingest so a retry can resume it straight away"""
+    try:
+        db.rollback()
+        checkpoint.updated_at = datetime.utcnow() - timedelta(seconds=INGEST_LEASE_SECONDS)
+        db.commit()
+    except Exception as e:
+        logging.error(f"Error releasing ingest checkpoint: {e}")
+
 @app.get("/documents")
 async def get_documents():
     db = next(get_db())
@@ -133,10 +237,12 @@ async def get_documents():
 async def query_knowledge(request: QueryRequest):
     try:
         print(f"Processing query: {request.question}")  # Debug log
+        db = next(get_db())
         response = knowledge_agent.query(
             question=request.question,
             user_id="default",
-            context=request.context
+            context=request.context,
+            where=build_where(db, request.filters)
         )
         
         return QueryResponse(
@@ -151,6 +257,40 @@ async def query_knowledge(request: QueryRequest):
         traceback.print_exc()  # This will print the full traceback
         raise HTTPException(status_code=500, detail=str(e))
     
+@app.post("/query/batch")
+async def query_knowledge_batch(request: BatchQueryRequest):
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    
+    try:
+        db = next(get_db())
+        
+        # A filter that fails to resolve fails only its own item
+        wheres, errors = [], []
+        for query in request.queries:
+            try:
+                wheres.append(build_where(db, query.filters))
+                errors.append(None)
+            except Exception as e:
+                logging.error(f"Error resolving batch query filters: {e}")
+                wheres.append(None)
+                errors.append(str(e))
+        
+        responses = await knowledge_agent.query_many(
+            questions=[query.question for query in request.queries],
+            user_id="default",
+            contexts=[query.context for query in request.queries],
+            wheres=wheres,
+            max_concurrency=QUERY_BATCH_CONCURRENCY,
+            errors=errors
+        )
+        
+        return [BatchQueryItem(**response) for response in responses]
+    
+    except Exception as e:
+        logging.error(f"Error processing batch query: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
 @app.delete("/documents/{document_id}")
 async def delete_document(document_id: str):
     try:
@@ -166,6 +306,7 @@ async def delete_document(document_id: str):
         
         # Delete from database
         db.delete(document)
+        db.query(IngestCheckpoint).filter(IngestCheckpoint.document_id == document_id).delete()
         db.commit()
         
         return {"message": "Document deleted successfully"}
@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Keep app.database away from the real knowledge_copilot.db
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+@pytest.fixture
+def db():
+    """A session on the test database, emptied again after the test"""
+    from app.database import Base, SessionLocal, engine
+
+    session = SessionLocal()
+    yield session
+    session.close()
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
@@ -0,0 +1,50 @@
+import mailbox
+from email.message import EmailMessage
+
+import pytest
+
+from app.database import Document
+from app.mailbox_importer import MailboxImporter
+
+class FakeProcessor:
+    def process_email_message(self, msg):
+        return [{"content": msg.get_content().strip()}]
+
+class FakeVectorStore:
+    def __init__(self, fail_on=None):
+        self.chunks = {}
+        self.fail_on = fail_on
+
+    def add_documents(self, chunks, document_id, user_id, filename, extra_metadata=None):
+        if self.fail_on and self.fail_on in chunks[0]["content"]:
+            raise RuntimeError("simulated crash")
+        for i, chunk in enumerate(chunks):
+            self.chunks[f"{document_id}_{i}"] = chunk["content"]
+
+@pytest.fixture
+def mbox_path(tmp_path):
+    path = str(tmp_path / "inbox")
+    box = mailbox.mbox(path)
+    for i in range(5):
+        msg = EmailMessage()
+        msg["Subject"] = f"Message {i}"
+        msg["From"] = "alice@example.com"
+        if i != 4:  # One message without a Message-ID falls back to its mailbox key
+            msg["Message-ID"] = f"<{i}@example.com>"
+        msg.set_content(f"body {i}")
+        box.add(msg)
+    box.close()
+    return path
+
+def test_rerun_after_crash_imports_each_message_once(db, mbox_path):
+    store = FakeVectorStore(fail_on="body 2")
+    stats = MailboxImporter(FakeProcessor(), store).import_mailbox(mbox_path)
+    assert stats["imported"] == 4 and stats["failed"] == 1
+
+    store.fail_on = None
+    stats = MailboxImporter(FakeProcessor(), store).import_mailbox(mbox_path)
+    assert stats["imported"] == 1
+    assert stats["already_imported"] == 4
+
+    assert db.query(Document).count() == 5
+    assert sorted(store.chunks.values()) == [f"body {i}" for i in range(5)]
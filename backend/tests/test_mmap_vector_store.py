@@ -0,0 +1,97 @@
+import hashlib
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from app.mmap_vector_store import MmapVectorStore
+
+DOCUMENTS_PER_PROCESS = 40
+CHUNKS_PER_DOCUMENT = 8
+
+def fake_embedding_function(texts):
+    """Deterministic, text-specific vectors so a row can be checked against its content"""
+    return [
+        np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:8], 16)).standard_normal(16)
+        for text in texts
+    ]
+
+def add_documents_from_process(directory, prefix):
+    store = MmapVectorStore(directory, embedding_function=fake_embedding_function, batch_size=3)
+    for d in range(DOCUMENTS_PER_PROCESS):
+        chunks = [{"content": f"{prefix} document {d} chunk {c}"} for c in range(CHUNKS_PER_DOCUMENT)]
+        store.add_documents(chunks, f"{prefix}-{d}", "default", f"{prefix}-{d}.txt")
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_concurrent_writers_in_separate_processes(tmp_path, dtype):
+    directory = str(tmp_path)
+    # Create the index (and its dtype) before the writers race
+    MmapVectorStore(directory, dtype=dtype, embedding_function=fake_embedding_function)
+
+    # Spawned like uvicorn workers; forked children would share the parent's SQLite handles
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=add_documents_from_process, args=(directory, prefix)) for prefix in ("a", "b")]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    store = MmapVectorStore(directory, embedding_function=fake_embedding_function)
+    rows = store._conn.execute("SELECT row_id, content FROM chunks WHERE deleted = 0").fetchall()
+    assert len(rows) == 2 * DOCUMENTS_PER_PROCESS * CHUNKS_PER_DOCUMENT
+    assert store._live_count == len(rows)
+
+    # Every stored vector must belong to the text stored in the same row
+    row_ids = [row_id for row_id, _ in rows]
+    expected, expected_scales = store._quantize(store._embed([content for _, content in rows]))
+    np.testing.assert_array_equal(store._matrix[row_ids], expected)
+    if expected_scales is not None:
+        np.testing.assert_allclose(store._scales[row_ids], expected_scales)
+
+def test_search_and_delete_across_processes(tmp_path):
+    directory = str(tmp_path)
+    writer = MmapVectorStore(directory, embedding_function=fake_embedding_function)
+    reader = MmapVectorStore(directory, embedding_function=fake_embedding_function)
+    writer.add_documents([{"content": "alpha"}, {"content": "beta"}], "doc-1", "default", "one.txt")
+    writer.add_documents([{"content": "gamma"}], "doc-2", "default", "two.txt")
+
+    assert reader.search("gamma", "default", n_results=1)[0]["metadata"]["document_id"] == "doc-2"
+
+    # Deleting two thirds of the rows only tombstones them
+    reader.delete_document("doc-1", "default")
+    assert reader._generation == 0
+    results = writer.search("alpha", "default", n_results=5)
+    assert [result["metadata"]["document_id"] for result in results] == ["doc-2"]
+
+    # Compaction is a separate step, picked up by the other instance on its next search
+    assert reader.compact_if_needed()
+    assert not reader.compact_if_needed()
+    results = writer.search("alpha", "default", n_results=5)
+    assert [result["metadata"]["document_id"] for result in results] == ["doc-2"]
+    assert writer._generation == 1
+
+def churn_and_compact(directory, rounds):
+    store = MmapVectorStore(directory, embedding_function=fake_embedding_function, batch_size=4)
+    for i in range(rounds):
+        store.add_documents([{"content": f"churn-{i} chunk {c}"} for c in range(16)], f"churn-{i}", "default", "churn.txt")
+        store.delete_document(f"churn-{i}", "default")
+        store.compact()
+
+def test_search_during_compaction_in_another_process(tmp_path):
+    directory = str(tmp_path)
+    store = MmapVectorStore(directory, embedding_function=fake_embedding_function)
+    texts = [f"stable document chunk {c}" for c in range(8)]
+    store.add_documents([{"content": text} for text in texts], "stable", "default", "stable.txt")
+
+    process = multiprocessing.get_context("spawn").Process(target=churn_and_compact, args=(directory, 40))
+    process.start()
+    try:
+        while process.is_alive():
+            # Row ids are renumbered by every compaction; results must still line up
+            for text, results in zip(texts, store.search_many(texts, "default", n_results=1)):
+                assert results[0]["content"] == text
+                assert results[0]["metadata"]["document_id"] == "stable"
+    finally:
+        process.join(timeout=120)
+    assert process.exitcode == 0
@@ -0,0 +1,78 @@
+import json
+import sys
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import reconciler as reconciler_module
+from app.database import Document, OrphanSuspect
+from app.reconciler import Reconciler
+
+class FakeVectorStore:
+    def __init__(self, document_ids):
+        self.document_ids = set(document_ids)
+
+    def iter_document_ids(self, page_size=1000):
+        yield from sorted(self.document_ids)
+
+    def has_document(self, document_id):
+        return document_id in self.document_ids
+
+    def delete_documents(self, document_ids):
+        self.document_ids -= set(document_ids)
+
+    def compact_if_needed(self):
+        return False
+
+@pytest.fixture
+def store(db):
+    db.add(Document(id="kept", filename="kept.txt", processed=True, upload_date=datetime.utcnow() - timedelta(hours=1)))
+    db.commit()
+    return FakeVectorStore(["kept", "orphan"])
+
+def backdate_suspects(db, seconds):
+    for suspect in db.query(OrphanSuspect):
+        suspect.first_seen -= timedelta(seconds=seconds)
+    db.commit()
+
+def test_orphan_age_survives_a_restart(db, store):
+    stats = Reconciler(store, grace_seconds=300).run_once()
+    assert stats["orphans_deleted"] == 0 and stats["orphans_pending"] == 1
+
+    # A fresh process picks up the age recorded by the earlier pass
+    backdate_suspects(db, 301)
+    stats = Reconciler(store, grace_seconds=300).run_once()
+    assert stats["orphans_deleted"] == 1 and stats["orphans_pending"] == 0
+    assert store.document_ids == {"kept"}
+    assert db.query(OrphanSuspect).count() == 0
+
+def test_recovered_suspect_is_forgotten(db, store):
+    Reconciler(store, grace_seconds=300).run_once()
+    db.add(Document(id="orphan", filename="late.txt", processed=True))
+    db.commit()
+
+    Reconciler(store, grace_seconds=300).run_once()
+    assert db.query(OrphanSuspect).count() == 0
+
+def run_cli(monkeypatch, capsys, store, *args):
+    monkeypatch.setitem(sys.modules, "app.vector_store", types.SimpleNamespace(create_vector_store=lambda: store))
+    monkeypatch.setattr(sys, "argv", ["reconciler", *args])
+    reconciler_module.main()
+    return json.loads(capsys.readouterr().out)
+
+def test_cli_pass_deletes_orphan_past_grace(db, store, monkeypatch, capsys):
+    db.add(OrphanSuspect(document_id="orphan", first_seen=datetime.utcnow() - timedelta(seconds=301)))
+    db.commit()
+
+    stats = run_cli(monkeypatch, capsys, store)
+    assert stats["orphans_deleted"] == 1
+    assert store.document_ids == {"kept"}
+
+def test_cli_wait_deletes_new_orphan(db, store, monkeypatch, capsys):
+    # Stand in for the grace period passing
+    monkeypatch.setattr(reconciler_module.time, "sleep", lambda seconds: backdate_suspects(db, seconds))
+
+    stats = run_cli(monkeypatch, capsys, store, "--wait")
+    assert stats["orphans_deleted"] == 1 and stats["orphans_pending"] == 0
+    assert store.document_ids == {"kept"}
@@ -0,0 +1,30 @@
+import numpy as np
+
+from app.database import Document
+from app.mmap_vector_store import MmapVectorStore
+from app.snapshot import export_snapshot, import_snapshot
+
+from test_mmap_vector_store import fake_embedding_function
+
+def test_mmap_round_trip(db, tmp_path):
+    source = MmapVectorStore(str(tmp_path / "source"), dtype="int8", embedding_function=fake_embedding_function)
+    for d in range(3):
+        source.add_documents([{"content": f"document {d} chunk {c}"} for c in range(5)], f"doc-{d}", "default", f"{d}.txt")
+        db.add(Document(id=f"doc-{d}", filename=f"{d}.txt", file_type="text/plain", processed=True))
+    db.commit()
+
+    path = str(tmp_path / "snapshot.parquet")
+    assert export_snapshot(source, path, page_size=4) == {"documents": 3, "chunks": 15, "summaries": 0}
+
+    db.query(Document).delete()
+    db.commit()
+    target = MmapVectorStore(str(tmp_path / "target"), embedding_function=fake_embedding_function, batch_size=7)
+    stats = import_snapshot(target, path)
+    assert stats == {"documents": 3, "chunks": 15, "summaries": 0, "skipped": 0}
+    assert sorted(row.id for row in db.query(Document)) == ["doc-0", "doc-1", "doc-2"]
+
+    # Restored vectors rank their own text first, without re-embedding
+    results = target.search("document 1 chunk 3", "default", n_results=1)
+    assert results[0]["content"] == "document 1 chunk 3"
+    assert results[0]["metadata"]["document_id"] == "doc-1"
+    assert np.isclose(results[0]["distance"], 0, atol=0.05)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""End-to-end load test for the backend API.
+
+Boots ``main:app`` under uvicorn against a throwaway Chroma/SQLite directory and
+a local stub of the Gemini API, drives a mixed /upload, /query and /documents
+workload at a target request rate, then reports throughput, latency
+percentiles and error rate per endpoint.
+
+    python scripts/loadtest.py --rps 20 --duration 60 --llm-latency-ms 800
+    python scripts/loadtest.py --rps 40 --workers 4 --env VECTOR_BACKEND=mmap
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+WORDS = (
+    "system network storage latency throughput cache index vector document query answer "
+    "policy contract invoice manual install configure restart backup restore security "
+    "access token user report quarter revenue budget project deadline meeting review"
+).split()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_llm_stub(latency_ms, jitter_ms):
+    """Serve generateContent requests with a canned answer after a simulated delay"""
+    class GeminiStubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+            if not self.path.split("?")[0].endswith(":generateContent"):
+                self.send_error(404)
+                return
+
+            body = json.dumps({
+                "candidates": [{
+                    "content": {"role": "model", "parts": [{"text": "**Answer**\n• Stubbed response from the load test."}]},
+                    "finishReason": "STOP",
+                    "index": 0
+                }]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), GeminiStubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def start_app(port, workers, data_dir, llm_endpoint, extra_env):
+    """Run uvicorn in a subprocess with all state under ``data_dir``"""
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(data_dir, 'knowledge_copilot.db')}",
+        "CHROMA_PERSIST_DIRECTORY": os.path.join(data_dir, "chroma_db"),
+        "MMAP_INDEX_DIRECTORY": os.path.join(data_dir, "mmap_index"),
+        "GEMINI_API_KEY": "loadtest",
+        "GEMINI_API_ENDPOINT": llm_endpoint,
+        "RECONCILE_INTERVAL_SECONDS": "0",
+    })
+    env.update(extra_env)
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+async def wait_until_ready(client, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API process exited with code {process.returncode}")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("API did not become ready in time")
+
+def random_text(words):
+    return " ".join(random.choice(WORDS) for _ in range(words))
+
+async def do_upload(client, args):
+    content = random_text(args.upload_words).encode()
+    return await client.post("/upload", files={"file": (f"load_{random.getrandbits(32):08x}.txt", content, "text/plain")})
+
+async def do_query(client, args):
+    return await client.post("/query", json={"question": f"What does the {random_text(3)} say?"})
+
+async def do_documents(client, args):
+    return await client.get("/documents")
+
+OPERATIONS = {"upload": do_upload, "query": do_query, "documents": do_documents}
+
+async def timed(name, operation, client, args, results, semaphore, scheduled_at):
+    """Latency counts from the scheduled arrival, so time spent waiting for a
+    free slot under --max-in-flight is part of it (no coordinated omission)"""
+    async with semaphore:
+        try:
+            response = await operation(client, args)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        results[name].append((time.perf_counter() - scheduled_at, ok))
+
+async def run_workload(client, args, mix):
+    """Open-loop load: requests start on schedule whether or not earlier ones finished"""
+    for _ in range(args.seed_documents):
+        await do_upload(client, args)
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = {name: [] for name in names}
+    semaphore = asyncio.Semaphore(args.max_in_flight)
+    tasks = []
+
+    start = time.perf_counter()
+    next_at = start
+    while next_at - start < args.duration:
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        name = random.choices(names, weights)[0]
+        tasks.append(asyncio.create_task(timed(name, OPERATIONS[name], client, args, results, semaphore, next_at)))
+        # Poisson arrivals at the target rate
+        next_at += random.expovariate(args.rps)
+
+    await asyncio.gather(*tasks)
+    return results, time.perf_counter() - start
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+def summarize(results, elapsed):
+    report = {}
+    for name, samples in list(results.items()) + [("total", [s for samples in results.values() for s in samples])]:
+        latencies = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        report[name] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        }
+    return report
+
+def print_report(report):
+    print(f"{'endpoint':<12}{'requests':>10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>10}")
+    for name, row in report.items():
+        print(f"{name:<12}{row['requests']:>10}{row['throughput_rps']:>10}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['error_rate']:>10.2%}")
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, weight = part.split("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        mix[name] = float(weight)
+    return mix
+
+async def main_async(args):
+    stub = start_llm_stub(args.llm_latency_ms, args.llm_jitter_ms)
+    data_dir = tempfile.mkdtemp(prefix="copilot_loadtest_")
+    port = free_port()
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    process = start_app(port, args.workers, data_dir, f"http://127.0.0.1:{stub.server_address[1]}", extra_env)
+
+    try:
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits) as client:
+            await wait_until_ready(client, process, args.startup_timeout)
+            print(f"API ready on port {port} with {args.workers} worker(s); running {args.duration}s at {args.rps} rps")
+            results, elapsed = await run_workload(client, args, args.mix)
+
+        report = summarize(results, elapsed)
+        print_report(report)
+        if args.json:
+            with open(args.json, "w") as file:
+                json.dump({"config": {k: v for k, v in vars(args).items() if k != "json"}, "results": report}, file, indent=2)
+            print(f"Wrote {args.json}")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stub.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Personal Knowledge Copilot API")
+    parser.add_argument("--rps", type=float, default=10, help="Target request rate")
+    parser.add_argument("--duration", type=float, default=60, help="Measured run length in seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("query=70,documents=20,upload=10"),
+                        help="Weighted operations, e.g. query=70,documents=20,upload=10")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="uvicorn worker processes; more than 1 needs --env VECTOR_BACKEND=mmap")
+    parser.add_argument("--llm-latency-ms", type=float, default=500, help="Stub Gemini response time")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100, help="Uniform +/- jitter on the stub latency")
+    parser.add_argument("--seed-documents", type=int, default=20, help="Documents uploaded before measuring")
+    parser.add_argument("--upload-words", type=int, default=2000, help="Words per uploaded document")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Cap on concurrent client requests")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=180, help="Seconds to wait for the API to boot")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the API, e.g. --env VECTOR_BACKEND=mmap")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    backend = dict(item.split("=", 1) for item in args.env).get("VECTOR_BACKEND", os.getenv("VECTOR_BACKEND", "chroma"))
+    if args.workers > 1 and backend != "mmap":
+        # Each worker would open its own Chroma index and miss the others' uploads
+        parser.error("--workers > 1 is only valid with --env VECTOR_BACKEND=mmap")
+
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()